@@ -1,59 +1,75 @@
-from flask import Flask, request, jsonify, send_file
-from init import app
-from flask_cors import CORS # import CORS
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from init import create_app # application factory
 import db # import db
-from openai import OpenAI # import OpenAI class
-from models.quizModel import createQuiz, getQuiz, getAll, updateQuiz, deleteQuiz # import functions from models.quizModel
+from providers import openaiClient, claudeClient, geminiModel, complete, completeHedged, provider_slots # pooled LLM clients with timeouts, retries and hedging
+from models.quizModel import createQuiz, createQuizzes, getQuizJson, listQuizzes, searchQuizzes, iterQuizzes, getAttempt, getAttemptQuestionIds, getAnswerKey, cacheStats, checkQuestions, updateQuiz, updateQuestion, addQuestions, removeQuestion, deleteQuiz # import functions from models.quizModel
+from jobs import submitJob, getJob # background generation jobs
+from cache import MongoBackedCache, cacheKey, normalizeText # generation response cache
+import pdftext # cached per-page PDF text
+import images # image variants and upload dedupe
+from streaming import QuestionStreamParser, formatStreamEvents # incremental question streaming
+from quizparser import parseQuiz, parseDict # safe parsing of LLM output
+import questionindex # near-duplicate detection against saved questions
+from questionchecks import repairQuestion, quizIssues, localFeedback # local structural checks before LLM validation
+from grading import gradeSubmission # server-side grading of attempts
+from fileserving import gridfsResponse # streamed GridFS files with Range and caching headers
 from bson import ObjectId 
+from bson.errors import InvalidId
 from datetime import datetime
 import os
-import uuid
+import re
+import copy
+import time
 from dotenv import load_dotenv 
 from werkzeug.utils import secure_filename # For image file upload handling
-from gridfs import GridFS # For file storage
 from urllib.parse import unquote # For URL decoding
+from concurrent.futures import ThreadPoolExecutor, as_completed # For running generation batches concurrently
+from functools import partial
 
-# For PDF parsing
-import PyPDF2
-import requests
+# For PDF parsing (PyPDF2 and requests are imported where they're used to keep startup cheap)
 import io
 
-# Import Anthropic
-from anthropic import Anthropic
-
-# Import Google gemini
-import google.generativeai as genai
-
 
 # load environment variables from .env file
 load_dotenv()
 MONGODB_URI = os.environ.get('MONGODB_URI')
-OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
-ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
-GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY')
 
-CORS(app, supports_credentials=True) # enable CORS
+# All routes live on this blueprint, the app itself is built by create_app at the bottom of this file
+quiz_routes = Blueprint('quiz', __name__)
 
-# Initialize GPT client
-client = OpenAI( # create instance of OpenAI
-    api_key=OPENAI_API_KEY
-)
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
-# Initialize claude client
-claude_client = Anthropic(
-    api_key=ANTHROPIC_API_KEY
+# Batched generation settings, concurrency is capped so large quizzes don't flood the API
+BATCH_SIZE = 10  # Reduce batch size from 15 to 10
+BATCH_CONCURRENCY = int(os.environ.get('GENERATION_BATCH_CONCURRENCY', 4))
+BATCH_RETRIES = int(os.environ.get('GENERATION_BATCH_RETRIES', 2))
+BATCH_RETRY_BACKOFF = float(os.environ.get('GENERATION_BATCH_RETRY_BACKOFF', 1.0))  # seconds, doubled each retry
+CONCEPT_CONCURRENCY = int(os.environ.get('CONCEPT_EXTRACTION_CONCURRENCY', 4))  # parallel concept calls for large PDFs
+
+# Most quizzes accepted by one bulk create request
+MAX_BULK_QUIZZES = int(os.environ.get('MAX_BULK_QUIZZES', 5000))
+
+# Questions judged per validation call, and validation calls sent at once
+VALIDATION_MODEL = "gpt-3.5-turbo"
+VALIDATION_GROUP_SIZE = int(os.environ.get('VALIDATION_GROUP_SIZE', 5))
+VALIDATION_CONCURRENCY = int(os.environ.get('VALIDATION_CONCURRENCY', 4))
+
+# Question fields a validation looks at, and so the ones its cache key covers
+VALIDATED_FIELDS = ('question', 'options', 'correctAnswer', 'isMultiAnswer', 'explanation')
+
+# Per-question validation results keyed on question content and difficulty
+validation_cache = MongoBackedCache(
+    lambda: db.quizdb.validationcache,
+    maxsize=int(os.environ.get('VALIDATION_CACHE_SIZE', 2048)),
+    ttl=int(os.environ.get('VALIDATION_CACHE_TTL', 30 * 24 * 60 * 60))
 )
 
-# Configure the Gemini API
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-else:
-    print("Warning: GOOGLE_API_KEY not found in environment variables")
-
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-
-# Initialize GridFS
-fs = GridFS(db.quizdb)
+# Cache of parsed LLM generations keyed on the prompt inputs, so repeat requests skip the API call
+generation_cache = MongoBackedCache(
+    lambda: db.quizdb.generationcache,
+    maxsize=int(os.environ.get('GENERATION_CACHE_SIZE', 128)),
+    ttl=int(os.environ.get('GENERATION_CACHE_TTL', 7 * 24 * 60 * 60))
+)
 
 # test data
 data = {
@@ -63,19 +79,19 @@ data = {
 }
 
 # test route
-@app.route('/')  
+@quiz_routes.route('/')  
 def home():
     print("successful connection to Quiz Service")
     return "Quiz Service"
 
 # test route with data
-@app.route('/data', methods=['POST'])
+@quiz_routes.route('/data', methods=['POST'])
 def insert_data():
     db.db.collection.insert_one(data)
     return jsonify("Data inserted successfully" + str(data))
 
 # Create a new quiz using POST method and return the quizID in the response
-@app.route('/api/quiz', methods=['POST'])
+@quiz_routes.route('/api/quiz', methods=['POST'])
 def CreateQuiz():
     try: 
         
@@ -88,100 +104,333 @@ def CreateQuiz():
         
         quizResponse = createQuiz(quizData)
 
-        quizId = quizResponse['quiz_id']
-
-        # Build quiz object
-        newQuiz = {
-            '_id': quizId,
-            'title': quizData['title'],
-            'description': quizData.get('description', ''),
-            'category': quizData.get('category', 'Custom'),
-            'difficulty': quizData.get('difficulty', 'intermediate'),
-            'userId': quizData.get('userId', ''),
-            'randomizeQuestions': quizData.get('randomizeQuestions', False), 
-            'useQuestionPool': quizData.get('useQuestionPool', False),
-            'questionsPerAttempt': quizData.get('questionsPerAttempt'),
-            'questions': []
-        }
-
-        # Process questions with new IDs
-        for question in quizData.get('questions', []):
-            questionId = str(uuid.uuid4())
-            newQuiz['questions'].append({
-                'id': questionId,
-                'question': question['question'],
-                'options': question['options'],
-                'correctAnswer': question['correctAnswer'],
-                'imageUrl': question.get('imageUrl'),
-                'explanation': question.get('explanation', False),
-                'explanation': question.get('explanation', '')
-            })
-
-
-        # Return response
+        # Return the quiz as stored, so question IDs match the database
+        newQuiz = quizResponse['quiz']
+        newQuiz['difficulty'] = quizData.get('difficulty', 'intermediate')
         return jsonify(newQuiz), 201
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error creating quiz: {e}")
         return jsonify({"error": "Failed to create quiz", "details": str(e)}), 500
+
+# Create many quizzes in one call, e.g. when importing a course bank.
+# Body is {"quizzes": [...], "userId": optional default}, each quiz is validated on its own and
+# the response has one result per quiz in order with its new ID or the reason it failed
+@quiz_routes.route('/api/quizzes/bulk', methods=['POST'])
+def CreateQuizzesBulk():
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    quizzes = data.get('quizzes')
+    if not isinstance(quizzes, list) or not quizzes:
+        return jsonify({"error": "quizzes must be a non-empty list"}), 400
+    if len(quizzes) > MAX_BULK_QUIZZES:
+        return jsonify({"error": f"At most {MAX_BULK_QUIZZES} quizzes per request"}), 400
+
+    try:
+        results = createQuizzes(quizzes, defaultUserId=data.get('userId'))
+    except Exception as e:
+        print(f"Error bulk creating quizzes: {e}")
+        return jsonify({"error": "Failed to create quizzes", "details": str(e)}), 500
+
+    inserted = sum(1 for result in results if 'quiz_id' in result)
+    return jsonify({
+        'inserted': inserted,
+        'failed': len(results) - inserted,
+        'results': results
+    }), 201 if inserted == len(results) else 207
     
 
-# Get a quiz by quizID using GET method and return the quiz in the response
-@app.route('/api/quiz/<quizID>', methods=['GET'])
+# ETag of a quiz at a version
+def quiz_etag(quizID, version):
+    return f"{quizID}-{version}"
+
+# Version the client expects from an If-Match header, None when there is no precondition.
+# Raises ValueError if the header names a different quiz or isn't one of our ETags.
+def if_match_version(quizID):
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    for tag in request.if_match.as_set():
+        prefix, _, version = tag.rpartition('-')
+        if prefix == quizID and version.isdigit():
+            return int(version)
+    raise ValueError("If-Match does not match this quiz")
+
+# Build the response for a versioned write: 404/412 when it didn't apply, otherwise body with the new ETag
+def versioned_write_response(quizID, result, body, status=200, missing="Error: Quiz not found"):
+    if not result['exists']:
+        return jsonify("Error: Quiz not found"), 404
+    if result['conflict']:
+        response = jsonify({"error": "Quiz has been modified, reload and try again", "version": result['version']})
+        response.status_code = 412
+        response.set_etag(quiz_etag(quizID, result['version']))
+        return response
+    if not result['matched']:
+        return jsonify(missing), 404
+    response = jsonify(body)
+    response.status_code = status
+    response.set_etag(quiz_etag(quizID, result['version']))
+    return response
+
+# Get a quiz by quizID using GET method and return the quiz in the response.
+# Sends an ETag and answers If-None-Match with 304. The JSON body is cached, so hits aren't serialised again
+@quiz_routes.route('/api/quiz/<quizID>', methods=['GET'])
 def getQuizByID(quizID):
     print(quizID)
-    quiz = getQuiz(quizID)
+    try:
+        quiz = getQuizJson(quizID, lambda document: current_app.json.dumps(document).encode('utf-8') + b'\n')
+    except InvalidId:
+        quiz = None
     if(quiz):
-        return jsonify(quiz)
+        etag = quiz_etag(quizID, quiz['version'])
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = Response(quiz['body'], mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache' # always revalidate, but reuse the copy on a 304
+        return response
+    return jsonify("Error: Quiz not found"), 404
+
+# Get the questions for one attempt at a quiz, sampled server-side with the answers left out.
+# ?seed= replays a previous attempt, ?count= overrides questionsPerAttempt
+@quiz_routes.route('/api/quiz/<quizID>/attempt', methods=['GET'])
+def getQuizAttempt(quizID):
+    try:
+        seed = request.args.get('seed', type=int)
+        count = request.args.get('count', type=int)
+        if count is not None and count < 1:
+            return jsonify({"error": "count must be at least 1"}), 400
+        attempt = getAttempt(quizID, seed=seed, count=count)
+    except InvalidId:
+        return jsonify("Error: Quiz not found"), 404
+    if attempt:
+        return jsonify(attempt)
     return jsonify("Error: Quiz not found"), 404
 
+# Grade one or more submitted attempts against the quiz's answer key.
+# Body is {"answers": {...}, "seed": ...} for one attempt or {"submissions": [{"answers": {...}, "seed": ...}, ...]}
+# for a class-wide bulk submission. seed (and count, if the attempt overrode it) come from GET .../attempt and
+# decide which questions are graded; without a seed every question of the quiz is graded.
+@quiz_routes.route('/api/quiz/<quizID>/grade', methods=['POST'])
+def gradeQuizAttempts(quizID):
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    submissions = data.get('submissions')
+    if submissions is None:
+        submissions = [data]
+    if not isinstance(submissions, list) or not all(isinstance(submission, dict) for submission in submissions):
+        return jsonify({"error": "submissions must be a list of objects"}), 400
+
+    try:
+        key = getAnswerKey(quizID)
+    except InvalidId:
+        key = None
+    if key is None:
+        return jsonify("Error: Quiz not found"), 404
+
+    results = []
+    for submission in submissions:
+        question_ids = None
+        if submission.get('seed') is not None:
+            try:
+                count = submission.get('count')
+                question_ids = getAttemptQuestionIds(quizID, int(submission['seed']), int(count) if count is not None else None)
+            except (TypeError, ValueError):
+                # A bad submission in a bulk list is reported on its own result, the rest are still graded
+                result = {"error": "seed and count must be integers"}
+                result.update({field: submission[field] for field in ('attemptId', 'userId') if field in submission})
+                results.append(result)
+                continue
+        results.append(gradeSubmission(key, submission, question_ids))
+    if 'submissions' not in data:
+        if 'error' in results[0]:
+            return jsonify(results[0]), 400
+        return jsonify(results[0])
+    return jsonify({'quizId': quizID, 'results': results})
+
+# Largest page size a listing request can ask for
+MAX_PAGE_SIZE = 100
+
+# Shared handler for quiz listings. Supports ?limit=&after=<quizId>&sort=newest|oldest|title&summary=true,
+# returns a page object when limit or after is given and the plain list otherwise.
+# Pages default to newest first, the plain list keeps insertion order unless ?sort= is given.
+def list_quizzes_response(filters):
+    try:
+        limit = request.args.get('limit', type=int)
+        after = request.args.get('after')
+        sort = request.args.get('sort')
+        summary = request.args.get('summary', 'false').lower() == 'true'
+        if limit is not None:
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+        elif after:
+            limit = MAX_PAGE_SIZE
+
+        quizzes, next_cursor = listQuizzes(filters, limit=limit, after=after, sort=sort, summary=summary)
+    except (ValueError, InvalidId) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    if limit is None:
+        return jsonify(quizzes)
+    return jsonify({'quizzes': quizzes, 'nextCursor': next_cursor})
+
 # Get all quizzes using GET method and return the quizzes in the response
-@app.route('/api/quizzes', methods=['GET'])
+@quiz_routes.route('/api/quizzes', methods=['GET'])
 def getAllQuizzes():
-    userId = request.args.get('userId')
-    quizzes = getAll(userId)
-    return jsonify(quizzes)
+    return list_quizzes_response({'userId': request.args.get('userId') or None})
 
 # get quizzes by category
-@app.route('/api/quizzes/category/<category>', methods=['GET'])
+@quiz_routes.route('/api/quizzes/category/<category>', methods=['GET'])
 def getQuizzesByCategory(category):
+    return list_quizzes_response({'category': category})
+
+SEARCH_PAGE_SIZE = 20
+
+# Search quizzes by title, description and question text, best matches first.
+# ?q= is required, ?category=&aiModel=&userId= narrow the results, ?limit=&after=<quizId> page through them
+# and ?sort=newest|oldest|title replaces relevance order. Results leave out the questions unless ?summary=false.
+@quiz_routes.route('/api/quizzes/search', methods=['GET'])
+def searchQuizzesRoute():
+    filters = {
+        'category': request.args.get('category') or None,
+        'aiModel': request.args.get('aiModel') or None,
+        'userId': request.args.get('userId') or None
+    }
     try:
-        quizzes = db.quizdb.quizcollection.find({'category': category})
-        quiz_list = []
-        for quiz in quizzes:
-            quiz['_id'] = str(quiz['_id'])
-            quiz_list.append(quiz)
-        return jsonify(quiz_list)
+        limit = max(1, min(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+        summary = request.args.get('summary', 'true').lower() == 'true'
+        quizzes, next_cursor = searchQuizzes(request.args.get('q'), filters, limit=limit, after=request.args.get('after'),
+                                             sort=request.args.get('sort', 'relevance'), summary=summary)
+    except (ValueError, InvalidId) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    return jsonify({'quizzes': quizzes, 'nextCursor': next_cursor})
+
+# Export every quiz for a user and/or category as a streamed response.
+# ?format=ndjson (one quiz per line, the default) or json (a chunked JSON array), ?batchSize= sets the cursor batch size
+@quiz_routes.route('/api/quizzes/export', methods=['GET'])
+def exportQuizzes():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'json'):
+        return jsonify({"error": "format must be ndjson or json"}), 400
+    batch_size = max(1, min(request.args.get('batchSize', 100, type=int), 1000))
+    summary = request.args.get('summary', 'false').lower() == 'true'
+    filters = {
+        'userId': request.args.get('userId') or None,
+        'category': request.args.get('category') or None
+    }
+    quizzes = iterQuizzes(filters, batch_size=batch_size, summary=summary)
 
-# Update a quiz by quizID using PUT method and return the response
-@app.route('/api/quiz/<quizID>', methods=['PUT'])
+    def ndjson():
+        for quiz in quizzes:
+            yield current_app.json.dumps(quiz) + '\n'
+
+    def json_array():
+        yield '['
+        first = True
+        for quiz in quizzes:
+            yield ('' if first else ',') + current_app.json.dumps(quiz)
+            first = False
+        yield ']'
+
+    if export_format == 'json':
+        return Response(stream_with_context(json_array()), mimetype='application/json')
+    return Response(stream_with_context(ndjson()), mimetype='application/x-ndjson')
+
+# Update a quiz by quizID using PUT method and return the response.
+# With If-Match the update only applies if the quiz is still at that version, otherwise 412
+@quiz_routes.route('/api/quiz/<quizID>', methods=['PUT'])
 def updateQuizByID(quizID):
     quizData = request.json
-    quiz = getQuiz(quizID)
-    if(quiz):
-        updateQuiz(quizID, quizData)
-        return jsonify("Quiz updated successfully")
-    return jsonify("Error: Quiz not found"), 404
+    if not isinstance(quizData, dict):
+        return jsonify({"error": "Quiz must be an object"}), 400
+    try:
+        if 'questions' in quizData:
+            checkQuestions(quizData['questions'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        result = updateQuiz(quizID, quizData, expectedVersion=if_match_version(quizID))
+    except InvalidId:
+        return jsonify("Error: Quiz not found"), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 412
+    return versioned_write_response(quizID, result, "Quiz updated successfully")
 
 # Delete a quiz by quizID using DELETE method and return the response
-@app.route('/api/quiz/<quizID>', methods=['DELETE'])
+@quiz_routes.route('/api/quiz/<quizID>', methods=['DELETE'])
 def deleteQuizByID(quizID):
-    quiz = getQuiz(quizID)
-    if(quiz):
-        deleteQuiz(quizID)
+    try:
+        result = deleteQuiz(quizID)
+    except InvalidId:
+        return jsonify("Error: Quiz not found"), 404
+    if result['matched']:
         return jsonify("Quiz deleted successfully")
     return jsonify("Error: Quiz not found"), 404
 
-# Validate a quiz using POST method and return the validation result in the response
-def validate_quiz_questions(quiz_data, parameters):
+# Add questions to a quiz, body is one question or {"questions": [...]}
+@quiz_routes.route('/api/quiz/<quizID>/questions', methods=['POST'])
+def addQuizQuestions(quizID):
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    questions = data.get('questions') if 'questions' in data else [data]
+    if not isinstance(questions, list) or not questions:
+        return jsonify({"error": "questions must be a non-empty list"}), 400
+    try:
+        checkQuestions(questions)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # Extract difficulty from parameters
-    difficulty = parameters.get('difficulty', 'intermediate')
+    try:
+        result = addQuestions(quizID, questions, expectedVersion=if_match_version(quizID))
+    except InvalidId:
+        return jsonify("Error: Quiz not found"), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 412
+    return versioned_write_response(quizID, result, {'questions': result['questions']}, status=201)
+
+# Edit one question without resending the rest of the quiz
+@quiz_routes.route('/api/quiz/<quizID>/questions/<questionId>', methods=['PATCH'])
+def updateQuizQuestion(quizID, questionId):
+    try:
+        expected_version = if_match_version(quizID)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 412
+    try:
+        result = updateQuestion(quizID, questionId, request.json or {}, expectedVersion=expected_version)
+    except InvalidId:
+        return jsonify("Error: Quiz not found"), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return versioned_write_response(quizID, result, "Question updated successfully", missing="Error: Question not found")
 
-    validation_response = client.chat.completions.create(
-        messages=[
+# Remove one question from a quiz
+@quiz_routes.route('/api/quiz/<quizID>/questions/<questionId>', methods=['DELETE'])
+def deleteQuizQuestion(quizID, questionId):
+    try:
+        result = removeQuestion(quizID, questionId, expectedVersion=if_match_version(quizID))
+    except InvalidId:
+        return jsonify("Error: Quiz not found"), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 412
+    return versioned_write_response(quizID, result, "Question deleted successfully", missing="Error: Question not found")
+
+# Validate one group of questions in a single call, returns ([result or None per question], overall summary).
+# Questions are numbered 1..n in the prompt so results map back to them whatever their IDs are.
+def validate_question_group(questions, difficulty):
+    numbered = [
+        {'question_id': str(index + 1), **{field: question.get(field) for field in VALIDATED_FIELDS}}
+        for index, question in enumerate(questions)
+    ]
+
+    validation_result = complete('gpt', model=VALIDATION_MODEL, messages=[
             {
                 "role": "system",
                 "content": f"""You are a quiz validator. Review quiz questions for {difficulty} level difficultly and provide a quality assessment. 
@@ -203,38 +452,114 @@ def validate_quiz_questions(quiz_data, parameters):
             {
                 "role": "user",
                 "content": f"""Review these quiz questions for {difficulty} level:
-                {quiz_data}
+                {numbered}
                 
-                Provide assessment in the following JSON format:
+                Provide assessment in the following JSON format, with one feedback entry per question:
                 {{
-                    'score': <0-100>,
                     'feedback': [
                         {{
                             'question_id': <id>,
                             'score': <0-100>,
+                            'difficulty_alignment': <0-100>,
                             'difficulty_rating': <'too_easy'|'appropriate'|'too_hard'>,
                             'issues': ['issue1', 'issue2'],
                             'suggestions': ['suggestion1', 'suggestion2']
                         }}
                     ],
-                    'difficulty_alignment': <0-100>,
                     'overall_feedback': <summary>
                 }}"""
             }
-        ],
-        model="gpt-3.5-turbo",
-    )
+        ])
     
     # Parse and clean validation result
-    validation_result = validation_response.choices[0].message.content.strip()
-    # Remove any text before the first '{' and after the last '}'
-    start = validation_result.find('{')
-    end = validation_result.rfind('}') + 1
-    if start == -1 or end == 0:
-        raise ValueError("No valid dictionary found in GPT validation response")
-    validation_result = validation_result[start:end]
-
-    validation = eval(validation_result[start:end])
+    validation, errors = parseDict(validation_result)
+    if validation is None:
+        raise ValueError(f"No valid dictionary found in GPT validation response: {'; '.join(errors)}")
+
+    by_id = {str(entry.get('question_id')): entry for entry in validation.get('feedback') or [] if isinstance(entry, dict)}
+    results = []
+    for index in range(len(questions)):
+        entry = by_id.get(str(index + 1))
+        try:
+            results.append({
+                'score': int(entry['score']),
+                'difficulty_alignment': int(entry.get('difficulty_alignment', entry['score'])),
+                'difficulty_rating': entry.get('difficulty_rating', 'appropriate'),
+                'issues': entry.get('issues') or [],
+                'suggestions': entry.get('suggestions') or []
+            })
+        except (TypeError, KeyError, ValueError):
+            results.append(None) # missing or malformed, left uncached so it is validated next time
+    return results, str(validation.get('overall_feedback') or '')
+
+# Cache key of a question's validation, its content and the difficulty it was judged against (not its ID)
+def validation_key(question, difficulty):
+    return cacheKey('validation', VALIDATION_MODEL, difficulty, {field: question.get(field) for field in VALIDATED_FIELDS})
+
+# Rebuild the whole-quiz validation shape from per-question results
+def aggregate_validation(questions, results, summaries):
+    feedback = [
+        {'question_id': question.get('id'), **result}
+        for question, result in zip(questions, results) if result is not None
+    ]
+    score = round(sum(entry['score'] for entry in feedback) / len(feedback)) if feedback else 0
+    judged = [entry['difficulty_alignment'] for entry in feedback if entry['difficulty_alignment'] is not None]
+    alignment = round(sum(judged) / len(judged)) if judged else 0
+    structural = sum(1 for entry in feedback if entry.get('structural'))
+
+    overall = [f"Average question score {score}/100 across {len(feedback)} questions."]
+    if structural:
+        overall.append(f"{structural} questions failed structural checks.")
+    if len(feedback) < len(questions):
+        overall.append(f"{len(questions) - len(feedback)} questions could not be validated.")
+    overall += [summary for summary in summaries if summary]
+    return {
+        'score': score,
+        'feedback': feedback,
+        'difficulty_alignment': alignment,
+        'overall_feedback': ' '.join(overall)
+    }
+
+# Validate a quiz's questions and return {'score', 'feedback', 'difficulty_alignment', 'overall_feedback'}.
+# Questions are validated VALIDATION_GROUP_SIZE at a time with the groups sent concurrently, and each
+# result is cached, so questions that haven't changed since they were last validated cost nothing.
+def validate_quiz_questions(quiz_data, parameters):
+
+    # Extract difficulty from parameters
+    difficulty = parameters.get('difficulty', 'intermediate')
+    questions = [question for question in quiz_data.get('questions', []) if isinstance(question, dict)]
+
+    # Questions failing the local structural checks get their feedback here and are never sent to the LLM
+    failing = quizIssues(questions)
+    keys = [validation_key(question, difficulty) for question in questions]
+    results = [localFeedback(failing[index]) if index in failing else validation_cache.get(key) for index, key in enumerate(keys)]
+    pending = [index for index, result in enumerate(results) if result is None]
+    groups = [pending[start:start + VALIDATION_GROUP_SIZE] for start in range(0, len(pending), VALIDATION_GROUP_SIZE)]
+    cached = len(questions) - len(pending) - len(failing)
+    if cached:
+        print(f"Validation cache hit for {cached}/{len(questions)} questions")
+
+    summaries = []
+    errors = []
+    if groups:
+        with ThreadPoolExecutor(max_workers=max(1, min(VALIDATION_CONCURRENCY, len(groups)))) as executor:
+            futures = [executor.submit(validate_question_group, [questions[index] for index in group], difficulty) for group in groups]
+            for group, future in zip(groups, futures):
+                try:
+                    group_results, summary = future.result()
+                except Exception as e:
+                    print(f"Validation of {len(group)} questions failed: {str(e)}")
+                    errors.append(str(e))
+                    continue
+                summaries.append(summary)
+                for index, result in zip(group, group_results):
+                    if result is not None:
+                        results[index] = result
+                        validation_cache.set(keys[index], result)
+
+    if pending and all(result is None for result in results):
+        raise ValueError(f"Validation failed: {'; '.join(errors) or 'no question results returned'}")
+    validation = aggregate_validation(questions, results, summaries)
     
     # Define difficulty threshold
     difficulty_threshold = {
@@ -252,7 +577,7 @@ def validate_quiz_questions(quiz_data, parameters):
 
 # Validate quiz questions using Anthropic Claude model
 # def validate_with_claude(quiz_data, difficulty):
-#     completion = claude_client.messages.create(
+#     completion = claudeClient().messages.create(
 #         model="claude-3-7-sonnet-20250219",
 #         messages=[{
 #             "role": "user",
@@ -308,7 +633,7 @@ def validate_quiz_questions(quiz_data, parameters):
 
 # Validate quiz questions using Google Gemini model
 # def validate_with_gemini(quiz_data, difficulty):
-#     model = genai.GenerativeModel('gemini-1.5-pro')
+#     model = geminiModel('gemini-1.5-pro')
 
 #     prompt = f"""You are a quiz validator. Review these quiz questions for {difficulty} level difficulty:
 #     {quiz_data}
@@ -357,7 +682,7 @@ def validate_quiz_questions(quiz_data, parameters):
 #     return apply_difficulty_threshold(validation, difficulty)
 
 # validate quiz questions using POST method and return the validation result in the response
-@app.route('/api/validate-quiz', methods=['POST'])
+@quiz_routes.route('/api/validate-quiz', methods=['POST'])
 def validate_quiz():
     try:
         data = request.json
@@ -383,77 +708,286 @@ def validate_quiz():
             "details": str(e)
         }), 400
     
-# Route for Gemini generation
-@app.route('/api/generate-quiz-gemini', methods=['POST'])
-def generate_quiz_gemini():
-    data = request.json
-    notes = data.get('notes')
-    pdf_url = data.get('pdfUrl')
-    parameters = data.get('parameters')
-    question_count = data['parameters'].get('questionCount', 1)
-    difficulty = parameters.get('difficulty', 'intermediate')
+# Return a cached generation for these prompt inputs, or run generate() and cache its result.
+# With provider, a result another provider answered (a hedged win) is returned but not cached,
+# the key describes provider's prompt and model.
+def cached_generation(key_parts, generate, use_cache=True, provider=None):
+    key = cacheKey(*key_parts)
+    if use_cache:
+        cached = generation_cache.get(key)
+        if cached is not None:
+            print("Generation cache hit", key[:12])
+            return cached
+
+    quiz_data = generate()
+    if provider and quiz_data.get('aiModel', provider) != provider:
+        return quiz_data
+    try:
+        generation_cache.set(key, quiz_data)
+    except Exception as e:
+        print(f"Failed to cache generation: {str(e)}")
+    return copy.deepcopy(quiz_data)
 
-    # Process PDF if URL is provided
+# Convert an optional 1-based inclusive {'start', 'end'} page range to 0-based start and exclusive end
+def parse_page_range(page_range):
+    if not page_range:
+        return None
+    start = page_range.get('start')
+    end = page_range.get('end')
+    return (int(start) - 1 if start else None, int(end) if end else None)
+
+# Pull the PDF text (if any) for a generation request
+def load_pdf_content(pdf_url, progress=None, page_range=None):
     pdf_content = ""
     if pdf_url:
-        pdf_content = extract_text_from_pdf(pdf_url) or ""
-
-    # Combine notes and PDF content
-    combined_content = f"{notes}\n{pdf_content}"
+        if progress:
+            progress('extracting_pdf')
+        pdf_content = extract_text_from_pdf(pdf_url, page_range=parse_page_range(page_range)) or ""
+    return pdf_content
+
+# Model used by each generation provider
+GENERATION_MODELS = {
+    'gpt': 'gpt-3.5-turbo',
+    'claude': 'claude-3-7-sonnet-20250219',
+    'gemini': 'gemini-1.5-pro',
+}
 
-    try:
-        # Configure the model
-        model = genai.GenerativeModel('gemini-1.5-pro')
-        
-        # Create prompt for Gemini
-        prompt = f"""Generate a {difficulty} level quiz with {question_count} questions based on:
+# Cache key parts for a generation, the whole parameters dict goes into the GPT prompt so it is part of that key
+def generation_key(provider, combined_content, difficulty, question_count, parameters):
+    key_parts = (provider, GENERATION_MODELS[provider], normalizeText(combined_content), difficulty, question_count)
+    if provider == 'gpt':
+        key_parts += (parameters,)
+    return key_parts
+
+# Build the Gemini generation prompt
+def build_gemini_prompt(combined_content, difficulty, question_count):
+    return f"""Generate a {difficulty} level quiz with {question_count} questions based on:
+
+    Content: {combined_content}
+
+    Format response as a valid JSON dictionary with exactly this structure:
+    {{
+        "title": "Quiz Title",
+        "description": "Brief description",
+        "questions": [
+            {{
+                "id": "1",
+                "question": "Question text",
+                "options": ["option1", "option2", "option3", "option4"],
+                "correctAnswer": "correct option",
+                "explanation": "Brief explanation"
+            }}
+        ]
+    }}
+
+    Important: Use double quotes for all keys and string values. Return only the JSON object without any additional text or code formatting."""
+
+# Build the Claude generation messages
+def build_claude_messages(combined_content, difficulty, question_count):
+    return [{
+        "role": "user",
+        "content": f"""Generate a {difficulty} level quiz with {question_count} questions based on:
 
         Content: {combined_content}
 
-        Format response as a valid JSON dictionary with exactly this structure:
+        Format response as a Python dictionary with this EXACT structure:
         {{
-            "title": "Quiz Title",
-            "description": "Brief description",
-            "questions": [
+            'title': 'Quiz Title',
+            'description': 'Brief description',
+            'questions': [
                 {{
-                    "id": "1",
-                    "question": "Question text",
-                    "options": ["option1", "option2", "option3", "option4"],
-                    "correctAnswer": "correct option",
-                    "explanation": "Brief explanation"
+                    'id': '1',
+                    'question': 'Question text',
+                    'options': ['option1', 'option2', 'option3', 'option4'],
+                    'correctAnswer': 'correct option',
+                    'explanation': 'Brief explanation'
                 }}
             ]
-        }}
+        }}"""
+    }]
+
+# Build the GPT generation messages
+def build_gpt_messages(combined_content, difficulty, question_count, parameters):
+    return [
+        {
+            "role": "system", 
+            "content": """You are a quiz generator. Generate quiz data in valid Python dictionary format only based on provided notes and/or PDF content. Include short, concise explanations for correct answers."""
+        },
+        {
+            "role": "user", 
+            "content": f"""Generate a {difficulty} level quiz with {question_count} questions based on the following content:
+            {combined_content}
+
+            Use these parameters:
+            {parameters}
+
+            Return the quiz in the following Python dictionary format:
+            {{
+                'title': 'Quiz Title',
+                'description': 'Quiz Description',
+                'questions': [
+                    {{
+                        'id': 1,
+                        'question': 'Question text',
+                        'options': ['option1', 'option2', 'option3', 'option4'],
+                        'correctAnswer': 'correct option',
+                        'explanation': 'Short explanation of why this is the correct answer',
+                        'imageUrl': None  # Optional image URL
+                    }}
+                ]
+            }}"""
+        }
+    ]
+
+# Provider to fall back to when the requested one is slow, set GENERATION_HEDGE_PROVIDER or send hedgeProvider
+HEDGE_PROVIDER = os.environ.get('GENERATION_HEDGE_PROVIDER')
+
+# complete() arguments for a full quiz generation from a provider
+def generation_request(provider, combined_content, difficulty, question_count, parameters):
+    if provider == 'gpt':
+        return {'model': GENERATION_MODELS['gpt'], 'messages': build_gpt_messages(combined_content, difficulty, question_count, parameters)}
+    if provider == 'claude':
+        return {'model': GENERATION_MODELS['claude'], 'messages': build_claude_messages(combined_content, difficulty, question_count),
+                'temperature': 1, 'max_tokens': 4000}
+    if provider == 'gemini':
+        return {'model': GENERATION_MODELS['gemini'], 'messages': [{"role": "user", "content": build_gemini_prompt(combined_content, difficulty, question_count)}]}
+    raise ValueError(f"Unknown provider: {provider}")
+
+# Generate and parse a quiz from provider. With a hedge provider the same quiz is also requested from it
+# if provider hasn't answered in time, and whichever parses first is used. 'aiModel' is the provider that answered.
+def generate_with_provider(provider, combined_content, difficulty, question_count, parameters, hedge_provider=None):
+    providers = [provider]
+    if hedge_provider and hedge_provider != provider:
+        if hedge_provider not in GENERATION_MODELS:
+            raise ValueError(f"Unknown hedge provider: {hedge_provider}")
+        providers.append(hedge_provider)
+
+    answered_by, quiz_data = completeHedged(
+        [(name, generation_request(name, combined_content, difficulty, question_count, parameters)) for name in providers],
+        parse=parse_generated_quiz
+    )
+    quiz_data = replace_failing_questions(quiz_data, answered_by, combined_content, difficulty)
+    quiz_data['aiModel'] = answered_by
+    return quiz_data
 
-        Important: Use double quotes for all keys and string values. Return only the JSON object without any additional text or code formatting."""
+# Question banks a generation is checked against for near-duplicates, from the request's userId and
+# category (top level or in parameters)
+def duplicate_scopes(data):
+    parameters = data.get('parameters') or {}
+    return questionindex.scopesFor(data.get('userId') or parameters.get('userId'), data.get('category') or parameters.get('category'))
+
+# What a client is told about a dropped question. The saved question it repeats is only named if it is
+# in the requester's own bank, a match found through the category scope may be another user's question.
+def duplicate_report(entry, scopes):
+    report = {'question': entry['question'].get('question')}
+    match = entry['duplicateOf']
+    own_scopes = {scope for scope in scopes if scope.startswith('user:')}
+    if 'scopes' not in match:
+        report['duplicateOf'] = {'text': match.get('text')} # an earlier question of this generation, IDs are renumbered
+    elif own_scopes.intersection(match['scopes']):
+        report['duplicateOf'] = {key: match[key] for key in ('quizId', 'questionId', 'text', 'similarity')}
+    return report
+
+# Drop generated questions that near-duplicate a saved question in scopes, one in accepted or an earlier
+# generated one, so repeats never reach the client. Dropped questions are listed in 'duplicatesRemoved'.
+def filter_duplicate_questions(quiz_data, scopes, accepted=()):
+    try:
+        kept, dropped = questionindex.filterDuplicates(quiz_data.get('questions', []), list(scopes), accepted=accepted)
+    except Exception as e:
+        print(f"Duplicate question check failed: {str(e)}")
+        return quiz_data
+    if dropped:
+        print(f"Dropped {len(dropped)} near-duplicate questions")
+        quiz_data['questions'] = kept
+        quiz_data.setdefault('duplicatesRemoved', []).extend(duplicate_report(entry, scopes) for entry in dropped)
+    return quiz_data
 
-        # Generate content
-        response = model.generate_content(prompt)
-        
-        # Extract the text from the response
-        generated_text = response.text
-        
-        # Clean and parse the response
-        quiz_data = parse_generated_quiz(generated_text)
-        
-        print("GEMINI AI RESPONSE ", quiz_data)
+# Replace questions dropped as near-duplicates with new ones from provider, so the quiz still has
+# question_count questions. One attempt, replacements that are themselves repeats are dropped too.
+def top_up_questions(quiz_data, provider, content, difficulty, question_count, scopes):
+    questions = quiz_data.get('questions', [])
+    missing = question_count - len(questions)
+    if missing <= 0 or not quiz_data.get('duplicatesRemoved'):
+        return quiz_data
+    avoid = [question.get('question') for question in questions] + [entry['question'] for entry in quiz_data['duplicatesRemoved']]
+    try:
+        extra = generate_extra_questions(provider, missing, avoid, content, difficulty)
+    except Exception as e:
+        print(f"Generating replacement questions failed: {str(e)}")
+        return quiz_data
+    extra = [question for index, question in enumerate(extra) if index not in quizIssues(extra)]
+    extra = filter_duplicate_questions({'questions': extra}, scopes, accepted=questions)
+    quiz_data['questions'] = questions + extra['questions'][:missing]
+    quiz_data['duplicatesRemoved'] += extra.get('duplicatesRemoved', [])
+    return quiz_data
 
-        # Validate quiz questions
-        validation = validate_quiz_questions(quiz_data, parameters)
-        quiz_data['validation'] = validation
+# Number questions 1..n, after questions were dropped or added
+def renumber_questions(questions):
+    for index, question in enumerate(questions):
+        question['id'] = str(index + 1)
+    return questions
+
+# Remove near-duplicates from a generated quiz, generate replacements and renumber the questions
+def remove_duplicate_questions(quiz_data, data, provider, content, difficulty, question_count):
+    scopes = duplicate_scopes(data)
+    quiz_data = filter_duplicate_questions(quiz_data, scopes)
+    if quiz_data.get('duplicatesRemoved'):
+        quiz_data = top_up_questions(quiz_data, quiz_data.get('aiModel', provider), content, difficulty, question_count, scopes)
+        renumber_questions(quiz_data['questions'])
+    return quiz_data
+
+# Generation pipeline for Gemini, shared by the route and background jobs
+def run_gemini_generation(data, progress=None):
+    notes = data.get('notes')
+    pdf_url = data.get('pdfUrl')
+    parameters = data.get('parameters')
+    question_count = data['parameters'].get('questionCount', 1)
+    difficulty = parameters.get('difficulty', 'intermediate')
+
+    # Process PDF if URL is provided
+    pdf_content = load_pdf_content(pdf_url, progress, data.get('pageRange'))
+
+    # Combine notes and PDF content
+    combined_content = f"{notes}\n{pdf_content}"
+
+    def generate():
+        return generate_with_provider('gemini', combined_content, difficulty, question_count, parameters,
+                                      data.get('hedgeProvider', HEDGE_PROVIDER))
+
+    if progress:
+        progress('generating')
+    quiz_data = cached_generation(
+        generation_key('gemini', combined_content, difficulty, question_count, parameters),
+        generate,
+        use_cache=not data.get('bypassCache'),
+        provider='gemini'
+    )
+    quiz_data = remove_duplicate_questions(quiz_data, data, 'gemini', combined_content, difficulty, question_count)
+    
+    print("GEMINI AI RESPONSE ", quiz_data)
+
+    # Validate quiz questions
+    if progress:
+        progress('validating')
+    validation = validate_quiz_questions(quiz_data, parameters)
+    quiz_data['validation'] = validation
 
-        # Add AI model to the quiz data
-        quiz_data['aiModel'] = 'gemini'
+    # Add AI model to the quiz data
+    quiz_data.setdefault('aiModel', 'gemini')
+
+    return quiz_data
 
-        return jsonify(quiz_data)
+# Route for Gemini generation
+@quiz_routes.route('/api/generate-quiz-gemini', methods=['POST'])
+def generate_quiz_gemini():
+    try:
+        return jsonify(run_gemini_generation(request.json))
     except Exception as e:
         print(f"Gemini API Error: {str(e)}")
         return jsonify({"error": str(e)}), 400
-    
-# Route for Claude generation
-@app.route('/api/generate-quiz-claude', methods=['POST'])
-def generate_quiz_claude():
-    data = request.json
+
+# Generation pipeline for Claude, shared by the route and background jobs
+def run_claude_generation(data, progress=None):
     notes = data.get('notes')
     pdf_url = data.get('pdfUrl')
     parameters = data.get('parameters')
@@ -461,153 +995,331 @@ def generate_quiz_claude():
     difficulty = parameters.get('difficulty', 'intermediate')
 
     # Process PDF if URL is provided
-    pdf_content = ""
-    if pdf_url:
-        pdf_content = extract_text_from_pdf(pdf_url) or ""
+    pdf_content = load_pdf_content(pdf_url, progress, data.get('pageRange'))
 
     # Combine notes and PDF content
     combined_content = f"{notes}\n{pdf_content}"
 
-    try:
-        # Claude API expects system content as a top-level parameter
-        completion = claude_client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            messages=[{
-                "role": "user",
-                "content": f"""Generate a {difficulty} level quiz with {question_count} questions based on:
-
-                Content: {combined_content}
-
-                Format response as a Python dictionary with this EXACT structure:
-                {{
-                    'title': 'Quiz Title',
-                    'description': 'Brief description',
-                    'questions': [
-                        {{
-                            'id': '1',
-                            'question': 'Question text',
-                            'options': ['option1', 'option2', 'option3', 'option4'],
-                            'correctAnswer': 'correct option',
-                            'explanation': 'Brief explanation'
-                        }}
-                    ]
-                }}"""
-            }],
-            temperature=1, 
-            max_tokens=4000,  
-        ) 
-        
-        # Get the response text from Claude's new response structure
-        generated_text = completion.content
-        if isinstance(generated_text, list) and len(generated_text) > 0:
-            generated_text = generated_text[0].text
+    def generate():
+        return generate_with_provider('claude', combined_content, difficulty, question_count, parameters,
+                                      data.get('hedgeProvider', HEDGE_PROVIDER))
+
+    if progress:
+        progress('generating')
+    quiz_data = cached_generation(
+        generation_key('claude', combined_content, difficulty, question_count, parameters),
+        generate,
+        use_cache=not data.get('bypassCache'),
+        provider='claude'
+    )
+    quiz_data = remove_duplicate_questions(quiz_data, data, 'claude', combined_content, difficulty, question_count)
 
-        # Clean and parse the response
-        quiz_data = parse_generated_quiz(generated_text)
+    print("Claude AI RESPONSE ", quiz_data)
 
-        print("Claude AI RESPONSE ", quiz_data)
+    if progress:
+        progress('validating')
+    validation = validate_quiz_questions(quiz_data, parameters)
+    quiz_data['validation'] = validation
 
-        validation = validate_quiz_questions(quiz_data, parameters)
-        quiz_data['validation'] = validation
+    # Add AI model to the quiz data
+    quiz_data.setdefault('aiModel', 'claude')
 
-        # Add AI model to the quiz data
-        quiz_data['aiModel'] = 'claude'
+    return quiz_data
 
-        return jsonify(quiz_data)
+# Route for Claude generation
+@quiz_routes.route('/api/generate-quiz-claude', methods=['POST'])
+def generate_quiz_claude():
+    try:
+        return jsonify(run_claude_generation(request.json))
     except Exception as e:
         print(f"Claude API Error: {str(e)}") 
         return jsonify({"error": str(e)}), 400
 
-# Generate a quiz using POST method and return the quiz in the response
-@app.route('/api/generate-quiz', methods=['POST'])
-def generate_quiz():
-    data = request.json
+# Generation pipeline for GPT, shared by the route and background jobs
+def run_gpt_generation(data, progress=None):
     notes = data.get('notes')
     pdf_url = data.get('pdfUrl')
     parameters = data.get('parameters')
-    format_example = data.get('format')
     question_count = data['parameters'].get('questionCount', 1)
     difficulty = parameters.get('difficulty', 'intermediate')
 
     # Process PDF if URL is provided
-    pdf_content = ""
-    if pdf_url:
-        pdf_content = extract_text_from_pdf(pdf_url) or ""
+    pdf_content = load_pdf_content(pdf_url, progress, data.get('pageRange'))
 
     # For larger question counts, use batching
     if question_count > 20:
-        return generate_questions_in_batches(notes, pdf_content, parameters, question_count, difficulty)
+        if progress:
+            progress('generating', batches=(question_count + BATCH_SIZE - 1) // BATCH_SIZE)
+        return generate_questions_in_batches(notes, pdf_content, parameters, question_count, difficulty,
+                                             use_cache=not data.get('bypassCache'), scopes=duplicate_scopes(data))
 
     # Combine notes and PDF content
     combined_content = f"{notes}\n{pdf_content}"
 
-    chat_completion = client.chat.completions.create(
-        messages=[
-            {
-                "role": "system", 
-                "content": """You are a quiz generator. Generate quiz data in valid Python dictionary format only based on provided notes and/or PDF content. Include short, concise explanations for correct answers."""
-            },
-            {
-                "role": "user", 
-                "content": f"""Generate a {difficulty} level quiz with {question_count} questions based on the following content:
-                {combined_content}
-
-                Use these parameters:
-                {parameters}
-
-                Return the quiz in the following Python dictionary format:
-                {{
-                    'title': 'Quiz Title',
-                    'description': 'Quiz Description',
-                    'questions': [
-                        {{
-                            'id': 1,
-                            'question': 'Question text',
-                            'options': ['option1', 'option2', 'option3', 'option4'],
-                            'correctAnswer': 'correct option',
-                            'explanation': 'Short explanation of why this is the correct answer',
-                            'imageUrl': None  # Optional image URL
-                        }}
-                    ]
-                }}"""
-            }
-        ],
-        model="gpt-3.5-turbo",
+    def generate():
+        return generate_with_provider('gpt', combined_content, difficulty, question_count, parameters,
+                                      data.get('hedgeProvider', HEDGE_PROVIDER))
+
+    if progress:
+        progress('generating')
+    quiz_data = cached_generation(
+        generation_key('gpt', combined_content, difficulty, question_count, parameters),
+        generate,
+        use_cache=not data.get('bypassCache'),
+        provider='gpt'
     )
+    quiz_data = remove_duplicate_questions(quiz_data, data, 'gpt', combined_content, difficulty, question_count)
+    print("OPEN AI RESPONSE ", quiz_data)
 
-    generated_text = chat_completion.choices[0].message.content.strip()
-    
-    try:
-        quiz_data = parse_generated_quiz(generated_text)
-        print("OPEN AI RESPONSE ", quiz_data)
+    # Validate quiz questions
+    if progress:
+        progress('validating')
+    validation = validate_quiz_questions(quiz_data, parameters)
 
-        # Validate quiz questions
-        validation = validate_quiz_questions(quiz_data, parameters)
-
-        # Check both overall quality and difficulty alignment
-        if validation['score'] < 70 or validation['difficulty_alignment'] < parameters.get('difficulty_threshold', 70):
-            quiz_data['validation'] = validation
-            quiz_data['warning'] = "Quiz may not meet quality or difficulty requirements"
-            return jsonify(quiz_data)  # Return the whole quiz data object
-            
-        # Add validation results to quiz data
+    # Check both overall quality and difficulty alignment
+    if validation['score'] < 70 or validation['difficulty_alignment'] < parameters.get('difficulty_threshold', 70):
         quiz_data['validation'] = validation
+        quiz_data['warning'] = "Quiz may not meet quality or difficulty requirements"
+        return quiz_data  # Return the whole quiz data object
+        
+    # Add validation results to quiz data
+    quiz_data['validation'] = validation
+
+    print("Quiz validation passed successfully with score:", validation['score'])
 
-        print("Quiz validation passed successfully with score:", validation['score'])
+    # Add AI model to the quiz data
+    quiz_data.setdefault('aiModel', 'gpt')
 
-        # Add AI model to the quiz data
-        quiz_data['aiModel'] = 'gpt'
+    return quiz_data
 
-        return jsonify(quiz_data)
+# Generate a quiz using POST method and return the quiz in the response
+@quiz_routes.route('/api/generate-quiz', methods=['POST'])
+def generate_quiz():
+    try:
+        return jsonify(run_gpt_generation(request.json))
     except Exception as e:
         print(f"Generation error: {str(e)}") 
         return jsonify({"error": "Failed to generate/validate quiz", "details": str(e)}), 400
 
+# Stream the raw generated text from a provider, one text fragment at a time
+def stream_generation_text(provider, combined_content, difficulty, question_count, parameters):
+    if provider not in provider_slots:
+        raise ValueError(f"Unknown provider: {provider}")
+    with provider_slots[provider]: # streams count towards the provider's concurrency limit
+        yield from stream_provider_text(provider, combined_content, difficulty, question_count, parameters)
+
+def stream_provider_text(provider, combined_content, difficulty, question_count, parameters):
+    if provider == 'gpt':
+        stream = openaiClient().chat.completions.create(
+            messages=build_gpt_messages(combined_content, difficulty, question_count, parameters),
+            model=GENERATION_MODELS['gpt'],
+            stream=True,
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    elif provider == 'claude':
+        with claudeClient().messages.stream(
+            model=GENERATION_MODELS['claude'],
+            messages=build_claude_messages(combined_content, difficulty, question_count),
+            temperature=1,
+            max_tokens=4000,
+        ) as stream:
+            for text in stream.text_stream:
+                yield text
+    elif provider == 'gemini':
+        model = geminiModel(GENERATION_MODELS['gemini'])
+        for chunk in model.generate_content(build_gemini_prompt(combined_content, difficulty, question_count), stream=True):
+            yield chunk.text
+    else:
+        raise ValueError(f"Unknown provider: {provider}")
+
+# Stream a quiz as it is generated, each question is sent as soon as its object is complete unless it
+# repeats a saved question, followed by replacements for any repeats, the quiz title/description and
+# finally the validation result
+@quiz_routes.route('/api/generate-quiz-stream', methods=['POST'])
+def generate_quiz_stream():
+    data = request.json or {}
+    provider = data.get('provider', 'gpt')
+    if provider not in GENERATION_MODELS:
+        return jsonify({"error": f"Unknown provider: {provider}"}), 400
+    if not data.get('parameters'):
+        return jsonify({"error": "parameters are required"}), 400
+
+    use_sse = 'text/event-stream' in request.headers.get('Accept', '')
+
+    def events():
+        try:
+            parameters = data['parameters']
+            question_count = parameters.get('questionCount', 1)
+            difficulty = parameters.get('difficulty', 'intermediate')
+            pdf_content = load_pdf_content(data.get('pdfUrl'), page_range=data.get('pageRange'))
+            combined_content = f"{data.get('notes')}\n{pdf_content}"
+
+            key = cacheKey(*generation_key(provider, combined_content, difficulty, question_count, parameters))
+            quiz_data = None if data.get('bypassCache') else generation_cache.get(key)
+            scopes = duplicate_scopes(data)
+            sent = [] # questions sent to the client, numbered in the order they went out
+            removed = [] # duplicatesRemoved entries
+
+            # The question as it is sent, or None if it repeats a saved question or one already sent
+            def checked(question):
+                result = filter_duplicate_questions({'questions': [question]}, scopes, accepted=sent)
+                removed.extend(result.get('duplicatesRemoved', []))
+                if not result['questions']:
+                    return None
+                question = {**result['questions'][0], 'id': str(len(sent) + 1)}
+                sent.append(question)
+                return question
+
+            if quiz_data is not None:
+                # Cached generation, send every question straight away
+                for question in quiz_data.get('questions', []):
+                    question = checked(question)
+                    if question:
+                        yield {'type': 'question', 'question': question}
+            else:
+                parser = QuestionStreamParser()
+                for text in stream_generation_text(provider, combined_content, difficulty, question_count, parameters):
+                    for question in parser.feed(text):
+                        # Repaired as parse_generated_quiz repairs the final parse, so the client and the cache agree
+                        question = checked(repairQuestion(question))
+                        if question:
+                            yield {'type': 'question', 'question': question}
+
+                quiz_data = parse_generated_quiz(parser.text)
+                # Send any questions the incremental parser couldn't pick out on its own
+                for question in parser.remaining(quiz_data.get('questions', [])):
+                    question = checked(question)
+                    if question:
+                        yield {'type': 'question', 'question': question}
+                generation_cache.set(key, quiz_data)
+
+            if removed:
+                # Replacements for the repeats that were held back
+                topped_up = top_up_questions({'questions': list(sent), 'duplicatesRemoved': removed}, provider, combined_content, difficulty, question_count, scopes)
+                for question in topped_up['questions'][len(sent):]:
+                    question = {**question, 'id': str(len(sent) + 1)}
+                    sent.append(question)
+                    yield {'type': 'question', 'question': question}
+            quiz_data = {**quiz_data, 'questions': sent}
+
+            yield {
+                'type': 'quiz',
+                'title': quiz_data.get('title'),
+                'description': quiz_data.get('description'),
+                'aiModel': provider,
+                'duplicatesRemoved': removed
+            }
+
+            validation = validate_quiz_questions(quiz_data, parameters)
+            yield {'type': 'validation', 'validation': validation}
+            yield {'type': 'done'}
+        except Exception as e:
+            print(f"Streaming generation error: {str(e)}")
+            yield {'type': 'error', 'error': str(e)}
+
+    return Response(
+        stream_with_context(formatStreamEvents(events(), use_sse)),
+        mimetype='text/event-stream' if use_sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Generation pipelines by provider name, used by the job queue
+GENERATION_PIPELINES = {
+    'gpt': run_gpt_generation,
+    'claude': run_claude_generation,
+    'gemini': run_gemini_generation,
+}
+
+# Submit a generation job and return its ID straight away, the work runs on the job worker pool
+@quiz_routes.route('/api/generate-quiz-jobs', methods=['POST'])
+def submit_generation_job():
+    data = request.json or {}
+    provider = data.get('provider', 'gpt')
+    if provider not in GENERATION_PIPELINES:
+        return jsonify({"error": f"Unknown provider: {provider}"}), 400
+    if not data.get('parameters'):
+        return jsonify({"error": "parameters are required"}), 400
+
+    job_id = submitJob(provider, data, GENERATION_PIPELINES[provider])
+    return jsonify({
+        "jobId": job_id,
+        "status": "queued",
+        "statusUrl": f"/api/generate-quiz-jobs/{job_id}"
+    }), 202
+
+# Poll a generation job for its status, progress and result
+@quiz_routes.route('/api/generate-quiz-jobs/<job_id>', methods=['GET'])
+def get_generation_job(job_id):
+    job = getJob(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+# Generate a single batch of questions, retrying on failure with a short backoff
+def generate_question_batch(batch, batches_needed, questions_in_batch, content_to_use, difficulty):
+    last_error = None
+    for attempt in range(BATCH_RETRIES + 1):
+        try:
+            # Transient errors and unparseable batches are both retried by this loop
+            generated_text = complete('gpt', model="gpt-3.5-turbo", max_tokens=3000, retries=0, messages=[
+                    {
+                        "role": "system", 
+                        "content": """You are a quiz generator. Generate quiz data in valid Python dictionary format only."""
+                    },
+                    {
+                        "role": "user", 
+                        "content": f"""Generate a {difficulty} level quiz with EXACTLY {questions_in_batch} questions based on the following content.
+                        These will be part {batch+1} of {batches_needed} in a larger quiz, so make them diverse:
+                        {content_to_use}
+                        
+                        Return the quiz in the following Python dictionary format:
+                        {{
+                            'title': 'Quiz Part {batch+1}',
+                            'description': 'Generated quiz questions part {batch+1}',
+                            'questions': [
+                                {{
+                                    'id': '{batch*BATCH_SIZE+1}',
+                                    'question': 'Question text',
+                                    'options': ['option1', 'option2', 'option3', 'option4'],
+                                    'correctAnswer': 'correct option',
+                                    'explanation': 'Short explanation of why this is the correct answer'
+                                }}
+                            ]
+                        }}"""
+                    }
+                ])
+
+            # Parse batch results, a batch that is mostly structurally broken is regenerated whole
+            batch_data = replace_failing_questions(parse_generated_quiz(generated_text), 'gpt', content_to_use, difficulty)
+            failing = quizIssues(batch_data.get('questions', []))
+            if len(failing) * 2 > len(batch_data.get('questions', [])):
+                raise ValueError(f"{len(failing)} of {len(batch_data.get('questions', []))} questions failed structural checks")
+            return batch_data
+        except Exception as e:
+            last_error = e
+            print(f"Batch {batch+1}/{batches_needed} attempt {attempt+1} failed: {str(e)}")
+            if attempt < BATCH_RETRIES:
+                time.sleep(BATCH_RETRY_BACKOFF * (2 ** attempt))
+
+    raise last_error
+
+# Generate one batch, then validate its questions while the other batches are still generating.
+# The results land in validation_cache, so validating the merged quiz afterwards only reads the cache.
+def generate_and_prevalidate_batch(key_parts, generate, use_cache, parameters):
+    batch_data = cached_generation(key_parts, generate, use_cache)
+    if quizIssues(batch_data.get('questions', [])):
+        return batch_data # structurally broken questions are reported by the local checks, not worth an LLM call
+    try:
+        validate_quiz_questions(batch_data, parameters)
+    except Exception as e:
+        print(f"Early validation of batch failed: {str(e)}") # the merged quiz is validated again anyway
+    return batch_data
+
 # Generate a large number of questions by making multiple smaller requests
-def generate_questions_in_batches(notes, pdf_content, parameters, total_question_count, difficulty):
+def generate_questions_in_batches(notes, pdf_content, parameters, total_question_count, difficulty, use_cache=True, scopes=()):
     combined_content = f"{notes}\n{pdf_content}"
-    all_questions = []
-    batch_size = 10  # Reduce batch size from 15 to 10
     
     # If content is very large, we need to split it
     if len(combined_content) > 30000:  # ~7500 tokens
@@ -619,68 +1331,53 @@ def generate_questions_in_batches(notes, pdf_content, parameters, total_question
     else:
         content_chunks = [combined_content]
     
-    batches_needed = (total_question_count + batch_size - 1) // batch_size
-    
-    for batch in range(batches_needed):
-        questions_in_batch = min(batch_size, total_question_count - len(all_questions))
-        if questions_in_batch <= 0:
-            break
-            
-        # Select which content chunk to use (rotate through chunks)
-        content_to_use = content_chunks[batch % len(content_chunks)]
-        
-        print(f"Generating batch {batch+1}/{batches_needed} with {questions_in_batch} questions")
-        
-        # Generate batch of questions
-        batch_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system", 
-                    "content": """You are a quiz generator. Generate quiz data in valid Python dictionary format only."""
-                },
-                {
-                    "role": "user", 
-                    "content": f"""Generate a {difficulty} level quiz with EXACTLY {questions_in_batch} questions based on the following content.
-                    These will be part {batch+1} of {batches_needed} in a larger quiz, so make them diverse:
-                    {content_to_use}
-                    
-                    Return the quiz in the following Python dictionary format:
-                    {{
-                        'title': 'Quiz Part {batch+1}',
-                        'description': 'Generated quiz questions part {batch+1}',
-                        'questions': [
-                            {{
-                                'id': '{batch*batch_size+1}',
-                                'question': 'Question text',
-                                'options': ['option1', 'option2', 'option3', 'option4'],
-                                'correctAnswer': 'correct option',
-                                'explanation': 'Short explanation of why this is the correct answer'
-                            }}
-                        ]
-                    }}"""
-                }
-            ],
-            model="gpt-3.5-turbo",
-            max_tokens=3000  # Reduced from 4000
-        )
-        
-        # Parse batch results
-        generated_text = batch_completion.choices[0].message.content.strip()
-        batch_data = parse_generated_quiz(generated_text)
-        
-        # Add to combined results
-        all_questions.extend(batch_data.get('questions', []))
-        
-        # If this is the first batch, get the title and description
-        if batch == 0:
-            title = batch_data.get('title', f"{difficulty.capitalize()} Quiz")
-            description = batch_data.get('description', f"A {difficulty} level quiz with {total_question_count} questions")
+    batches_needed = (total_question_count + BATCH_SIZE - 1) // BATCH_SIZE
+
+    # Send the batches concurrently through a bounded pool, one future per batch in batch order
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_CONCURRENCY, batches_needed))) as executor:
+        futures = []
+        for batch in range(batches_needed):
+            questions_in_batch = min(BATCH_SIZE, total_question_count - batch * BATCH_SIZE)
+
+            # Select which content chunk to use (rotate through chunks)
+            content_to_use = content_chunks[batch % len(content_chunks)]
+
+            print(f"Generating batch {batch+1}/{batches_needed} with {questions_in_batch} questions")
+            futures.append(executor.submit(
+                generate_and_prevalidate_batch,
+                ('gpt-batch', 'gpt-3.5-turbo', normalizeText(content_to_use), difficulty, questions_in_batch, batch, batches_needed),
+                partial(generate_question_batch, batch, batches_needed, questions_in_batch, content_to_use, difficulty),
+                use_cache,
+                parameters
+            ))
+
+        # Collect results in batch order so the merged quiz is deterministic
+        batch_results = []
+        for batch, future in enumerate(futures):
+            try:
+                batch_results.append(future.result())
+            except Exception as e:
+                print(f"Batch {batch+1}/{batches_needed} failed after retries: {str(e)}")
+
+    if not batch_results:
+        raise ValueError("All question batches failed to generate")
+
+    # Merge batches in order, dropping questions that near-duplicate one from another batch or the saved bank
+    all_questions = [question for batch_data in batch_results for question in batch_data.get('questions', [])]
+    all_questions = filter_duplicate_questions({'questions': all_questions}, scopes)['questions']
+
+    # Batches number their questions independently, so renumber the merged list
+    all_questions = renumber_questions(all_questions[:total_question_count])  # Only take the requested number
+
+    # Take the title and description from the first batch that came back
+    title = batch_results[0].get('title', f"{difficulty.capitalize()} Quiz")
+    description = batch_results[0].get('description', f"A {difficulty} level quiz with {total_question_count} questions")
     
     # Create combined result
     combined_quiz = {
         "title": title,
         "description": description,
-        "questions": all_questions[:total_question_count],  # Only take the requested number
+        "questions": all_questions,
         "aiModel": "gpt"
     }
     
@@ -690,32 +1387,92 @@ def generate_questions_in_batches(notes, pdf_content, parameters, total_question
     
     return combined_quiz
 
-# Parse the generated quiz text to extract the dictionary
+# Parse the generated quiz text to extract the dictionary, keeping whatever questions survive repair
 def parse_generated_quiz(generated_text):
+    quiz_data, errors = parseQuiz(generated_text)
+    if quiz_data is None:
+        raise ValueError(f"No valid dictionary found in response: {'; '.join(errors)}")
+
+    if errors:
+        print(f"Repaired generated quiz: {'; '.join(errors)}")
+        quiz_data['parseErrors'] = errors
+    quiz_data['questions'] = [repairQuestion(question) for question in quiz_data.get('questions', [])]
+    return quiz_data
 
-    # Clean up the response text
-    text = generated_text.strip()
-
-    # Remove any text before the first '{' and after the last '}'
-    start = text.find('{')
-    end = text.rfind('}') + 1
+# Ask provider for count more questions on content that don't repeat any in avoid, returns the parsed questions
+def generate_extra_questions(provider, count, avoid, content, difficulty):
+    generated_text = complete(provider, model=GENERATION_MODELS[provider], messages=[
+        {
+            "role": "system",
+            "content": "You are a quiz generator. Generate quiz data in valid Python dictionary format only."
+        },
+        {
+            "role": "user",
+            "content": f"""Generate EXACTLY {count} {difficulty} level quiz questions based on the following content.
+            Each question needs exactly 4 distinct options, a correctAnswer copied exactly from its options and a short explanation.
+            Do not repeat any of these existing questions: {avoid}
+            {content}
+
+            Return them in the following Python dictionary format:
+            {{
+                'questions': [
+                    {{
+                        'question': 'Question text',
+                        'options': ['option1', 'option2', 'option3', 'option4'],
+                        'correctAnswer': 'correct option',
+                        'explanation': 'Short explanation of why this is the correct answer'
+                    }}
+                ]
+            }}"""
+        }
+    ])
+    return parse_generated_quiz(generated_text).get('questions', [])
+
+# Ask provider for replacements of the questions that fail the local structural checks and swap in
+# the ones that pass, keeping the IDs. Questions that still fail are left for validation to report.
+def replace_failing_questions(quiz_data, provider, content, difficulty):
+    questions = quiz_data.get('questions', [])
+    failing = quizIssues(questions)
+    if not failing:
+        return quiz_data
+    print(f"Regenerating {len(failing)} questions that failed structural checks: {failing}")
 
-    if start == -1 or end == 0:
-        raise ValueError("No valid dictionary found in response")
-    
-    dict_text = text[start:end]
+    keep = [question.get('question') for index, question in enumerate(questions) if index not in failing]
+    try:
+        replacements = generate_extra_questions(provider, len(failing), keep, content, difficulty)
+    except Exception as e:
+        print(f"Regenerating failing questions failed: {str(e)}")
+        return quiz_data
 
-    # Remove any markdown formatting
-    dict_text = dict_text.replace('```python', '').replace('```', '')
-    dict_text = dict_text.strip()
-    
-    # Safely evaluate the dictionary string
-    quiz_data = eval(dict_text)
+    questions = list(questions)
+    for index in failing:
+        while replacements:
+            candidate = {**replacements.pop(0), 'id': questions[index].get('id')}
+            trial = questions[:index] + [candidate] + questions[index + 1:]
+            if index not in quizIssues(trial):
+                questions[index] = candidate
+                break
+    quiz_data['questions'] = questions
     return quiz_data
 
 # Extract text from PDF using PyPDF2 and handle both URLs and local file paths
-def extract_text_from_pdf(pdf_path, check_size=True):
+def extract_text_from_pdf(pdf_path, check_size=True, page_range=None):
     try:
+        start, end = page_range or (None, None)
+
+        # PDFs stored in our own GridFS are read from the cached page text, no download or re-parse
+        file_id = pdftext.gridfsIdFromUrl(pdf_path) if pdf_path.startswith(('http://', 'https://')) else None
+        if file_id:
+            pages = pdftext.getPages(file_id, start, end)
+            text = "".join(page + "\n" for page in pages)
+            print(f"Read cached text for {len(pages)} pages of PDF {file_id}")
+            if check_size and len(text) > 60000:
+                return "PDF_TOO_LARGE"
+            return text
+
+        import PyPDF2
+        import requests
+
         # Handle both URLs and local file paths
         if pdf_path.startswith(('http://', 'https://')):
             # For URLs
@@ -740,8 +1497,8 @@ def extract_text_from_pdf(pdf_path, check_size=True):
 
         # For smaller PDFs, proceed with normal extraction
         text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
+        for page in pdf_reader.pages[start:end]:
+            text += (page.extract_text() or "") + "\n"
         
         # Check if PDF is large
         if check_size and len(text) > 60000:
@@ -766,8 +1523,12 @@ def extract_text_from_pdf(pdf_path, check_size=True):
         print(f"Error processing PDF: {str(e)}")
         return None
 
+# Base URL of this service for links to stored files, set SERVICE_URL in production
+def service_url():
+    return os.environ.get('SERVICE_URL', 'http://localhost:9090')
+
 # Upload PDF file to GridFS and return the URL to access it
-@app.route('/api/upload-pdf', methods=['POST'])
+@quiz_routes.route('/api/upload-pdf', methods=['POST'])
 def upload_pdf():
     if 'pdf' not in request.files: # Check if 'pdf' part is in the request
         return jsonify({"error": "No pdf part"}), 400
@@ -777,115 +1538,149 @@ def upload_pdf():
         return jsonify({"error": "No selected file"}), 400
     
     try: # Try to process the file
-        # Store file in GridFS
+        # Store file in GridFS, or point at the copy already stored for the same content
         filename = secure_filename(file.filename) # Secure the filename
-        file_id = fs.put( 
-            file, 
-            filename=filename,
-            content_type=file.content_type
-        ) # Store the file in GridFS
+        file_id, created = pdftext.storePdf(file.stream, filename, file.content_type)
+
+        # Extract page text in the background so the first generation doesn't have to
+        if created:
+            pdftext.warmPageText(file_id)
         
         # Generate URL to access the PDF
-        # Use environment variable for production URL
-        base_url = os.environ.get('SERVICE_URL', 'http://localhost:9090')
-        pdf_url = f"{base_url}/pdfs/{str(file_id)}"
+        pdf_url = f"{service_url()}/pdfs/{str(file_id)}"
         
-        return jsonify({"pdfUrl": pdf_url})
+        return jsonify({"pdfUrl": pdf_url, "deduplicated": not created})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # Serve PDF file from GridFS using the file ID
-@app.route('/pdfs/<file_id>')
+@quiz_routes.route('/pdfs/<file_id>')
 def serve_pdf(file_id):
     try:
-        # Find file in GridFS
-        file_data = fs.get(ObjectId(file_id))
-        
-        # Create response with proper content type
-        response = send_file(
-            file_data,
-            mimetype='application/pdf',
-            as_attachment=False,
-            download_name=file_data.filename
-        )
-        
-        return response
+        # Find file in GridFS and stream it, with Range and conditional request support
+        return gridfsResponse(db.fs.get(ObjectId(file_id)), mimetype='application/pdf')
     except Exception as e:
         return jsonify({"error": str(e)}), 404
 
+# Release an uploaded PDF, the file is only deleted once every upload of it has been released
+@quiz_routes.route('/api/pdfs/<file_id>', methods=['DELETE'])
+def delete_pdf(file_id):
+    try:
+        remaining = pdftext.releasePdf(ObjectId(file_id))
+    except InvalidId:
+        remaining = None
+    if remaining is None:
+        return jsonify({"error": "PDF not found"}), 404
+    return jsonify({"message": "PDF deleted" if remaining == 0 else "PDF released", "references": remaining})
+
+# Extract key concepts from one batch of pages using AI
+def extract_batch_concepts(batch_text, concepts_per_batch, difficulty):
+    concepts_text = complete('gpt', model="gpt-3.5-turbo", messages=[
+        {"role": "system", "content": "Extract the most important concepts, terms, and facts from this text that would be good for quiz questions."},
+        {"role": "user", "content": f"Identify {concepts_per_batch} key concepts from this text that would make excellent quiz questions at {difficulty} level. Format each concept as a single sentence with the main term or idea clearly stated:\n\n{batch_text}"}
+    ])
+
+    # Parse concepts
+    return [c.strip() for c in concepts_text.split('\n') if c.strip()]
+
+# Merge concepts from all batches in page order, dropping repeats regardless of numbering or case
+def merge_concepts(concept_batches):
+    merged = []
+    seen = set()
+    for concepts in concept_batches:
+        for concept in concepts:
+            concept = re.sub(r'^\s*(?:\d+[.)]|[-*\u2022])\s*', '', concept).strip()
+            key = ' '.join(re.sub(r'[^a-z0-9 ]+', ' ', concept.lower()).split())
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            merged.append(concept)
+    return merged
+
 # Process large PDFs in seperate batches, generating questions based on extracted key concepts
-def process_large_pdf(pdf_path, question_count, difficulty): 
+def process_large_pdf(pdf_path, question_count, difficulty, progress=None): 
     try: 
-        # Open pdf using same method as extract_text_from_pdf
-        if pdf_path.startswith(('http://', 'https://')):
-            # For URLs
-            response = requests.get(pdf_path)
-            response.raise_for_status()
-            pdf_file = io.BytesIO(response.content)
+        # PDFs in our own GridFS already have their page text cached
+        file_id = pdftext.gridfsIdFromUrl(pdf_path) if pdf_path.startswith(('http://', 'https://')) else None
+        if file_id:
+            content_hash = pdftext.ensurePageText(file_id)
+            pages = pdftext.getPages(file_id)
         else:
-            # For local files - remove file:// prefix if present
-            if pdf_path.startswith('file:///'):
-                pdf_path = pdf_path[8:]  # Remove 'file:///'
-
-            # Decode URL-encoded characters in the path
-            pdf_path = unquote(pdf_path)
-
-            # Open local file directly
-            pdf_file = open(pdf_path, 'rb')
-
-        # Read PDF content
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        total_pages = len(pdf_reader.pages)
-
-        print("Processing large PDF with {total_pages} pages")
+            # Open pdf using same method as extract_text_from_pdf
+            if pdf_path.startswith(('http://', 'https://')):
+                # For URLs
+                import requests
+                response = requests.get(pdf_path)
+                response.raise_for_status()
+                content = response.content
+            else:
+                # For local files - remove file:// prefix if present
+                if pdf_path.startswith('file:///'):
+                    pdf_path = pdf_path[8:]  # Remove 'file:///'
+
+                # Decode URL-encoded characters in the path
+                pdf_path = unquote(pdf_path)
+
+                # Read local file directly
+                with open(pdf_path, 'rb') as pdf_file:
+                    content = pdf_file.read()
+
+            # Extract page text across a process pool
+            content_hash = pdftext.contentHash(content)
+            pages = pdftext.extractPagesParallel(content)
+
+        total_pages = len(pages)
+        print(f"Processing large PDF with {total_pages} pages")
 
         # Step 1: Process PDF in batches and extract key concepts
-        batch_size = min(5, total_pages) # Process 5 pages at a time
-        all_concepts = []
+        batch_size = max(1, min(5, total_pages)) # Process 5 pages at a time
+        concepts_per_batch = max(1, question_count //  ((total_pages // batch_size) + 1))
 
+        batches = []
         for start_page in range(0, total_pages, batch_size):
             # Get text from this batch of pages
-            batch_text = ""
             end_page = min(start_page + batch_size, total_pages)
-
-            for i in range(start_page, end_page):
-                page_text = pdf_reader.pages[i].extract_text() or ""
-                batch_text += page_text + "\n"
+            batch_text = "".join(page + "\n" for page in pages[start_page:end_page])
 
             # Skip empty batches
-            if not batch_text.strip():
-                continue
-
-            # Extract key concepts from the batch using AI
-            concepts_per_batch = max(1, question_count //  ((total_pages // batch_size) + 1))
-            print(f"Extracting {concepts_per_batch} concepts from pages {start_page + 1} to {end_page}")
-
-            concept_response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Extract the most important concepts, terms, and facts from this text that would be good for quiz questions."},
-                    {"role": "user", "content": f"Identify {concepts_per_batch} key concepts from this text that would make excellent quiz questions at {difficulty} level. Format each concept as a single sentence with the main term or idea clearly stated:\n\n{batch_text}"}
-                ]
-            )
-
-            # Parse concepts
-            concepts_text = concept_response.choices[0].message.content.strip()
-            concepts = [c.strip() for c in concepts_text.split('\n') if c.strip()]
-            all_concepts.extend(concepts)
-
-            print(f"Extracted {len(concepts)} concepts from batch")
-
-        if not isinstance(pdf_file, io.BytesIO):
-            pdf_file.close()
+            if batch_text.strip():
+                batches.append((start_page, end_page, batch_text))
+
+        # Reuse concepts already extracted from the same pages of the same content
+        concept_batches = [
+            pdftext.getConcepts(content_hash, start_page, end_page, concepts_per_batch, difficulty) or []
+            for start_page, end_page, _ in batches
+        ]
+
+        # Send the remaining concept extraction calls concurrently, bounded by CONCEPT_CONCURRENCY
+        pending = [index for index, concepts in enumerate(concept_batches) if not concepts]
+        completed = len(batches) - len(pending)
+        with ThreadPoolExecutor(max_workers=max(1, min(CONCEPT_CONCURRENCY, len(pending)))) as executor:
+            futures = {
+                executor.submit(extract_batch_concepts, batches[index][2], concepts_per_batch, difficulty): index
+                for index in pending
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                start_page, end_page, _ = batches[index]
+                completed += 1
+                try:
+                    concept_batches[index] = future.result()
+                    print(f"Extracted {len(concept_batches[index])} concepts from pages {start_page + 1} to {end_page} ({completed}/{len(batches)})")
+                    pdftext.storeConcepts(content_hash, start_page, end_page, concepts_per_batch, difficulty, concept_batches[index])
+                except Exception as e:
+                    print(f"Concept extraction failed for pages {start_page + 1} to {end_page}: {str(e)}")
+                if progress:
+                    progress('extracting_concepts', completed=completed, total=len(batches))
+
+        all_concepts = merge_concepts(concept_batches)
 
         # Step 2: Generate quiz questions based on extracted concepts
         concept_text = "\n".join(all_concepts)
         print(f"Generating quiz based on {len(all_concepts)} extracted concepts")
 
         # Generate the quiz using the concepts
-        chat_completion = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+        generated_text = complete('gpt', model="gpt-3.5-turbo", messages=[
                 {
                     "role": "system", 
                     "content": f"You are a quiz generator specializing in creating {difficulty} level questions based on key concepts provided."
@@ -914,10 +1709,8 @@ def process_large_pdf(pdf_path, question_count, difficulty):
                     }}
                     """
                 }
-            ]
-        )
+            ])
 
-        generated_text = chat_completion.choices[0].message.content.strip()
         quiz_data = parse_generated_quiz(generated_text)
         
         # Add metadata to indicate this was processed using the large PDF method
@@ -929,7 +1722,7 @@ def process_large_pdf(pdf_path, question_count, difficulty):
         return {"error": str(e)}
     
 # Categories management
-@app.route('/api/categories', methods=['GET'])
+@quiz_routes.route('/api/categories', methods=['GET'])
 def getCategories():
     try:
         # Get custom categories from database
@@ -941,7 +1734,7 @@ def getCategories():
         return jsonify({"error": str(e)}), 500
     
 # Add a new category using POST method and return the response
-@app.route('/api/categories', methods=['POST'])
+@quiz_routes.route('/api/categories', methods=['POST'])
 def addCategory():
     try:
         category_data = request.json
@@ -969,7 +1762,7 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 # Allowed file extensions for upload
-@app.route('/api/upload', methods=['POST'])
+@quiz_routes.route('/api/upload', methods=['POST'])
 def upload_file():
     if 'image' not in request.files:
         return jsonify({"error": "No image part"}), 400
@@ -980,52 +1773,63 @@ def upload_file():
         
     if file and allowed_file(file.filename):
         try:
-            # Store file in GridFS
+            # Store the image and its resized variants in GridFS, identical uploads share one copy
             filename = secure_filename(file.filename)
-            file_id = fs.put(
-                file,
-                filename=filename,
-                content_type=file.content_type
-            )
-            
-            # Generate URL using file_id
-            image_url = f"http://localhost:9090/images/{str(file_id)}"
-            
-            return jsonify({"imageUrl": image_url})
+            image = images.storeImage(file.read(), filename, file.content_type, service_url())
+
+            return jsonify({
+                "imageUrl": image['url'],
+                "width": image.get('width'),
+                "height": image.get('height'),
+                "sizes": {size: variant['width'] for size, variant in image['variants'].items()}
+            })
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             return jsonify({"error": str(e)}), 500
             
     return jsonify({"error": "Invalid file type"}), 400
 
-# Serve images from GridFS
-@app.route('/images/<file_id>')
+# Serve images from GridFS. ?size=thumb|small|medium|large picks a resized variant and
+# ?format=webp|original|auto its encoding, auto sends WebP to browsers that accept it.
+# Without size the image is full size in either format
+@quiz_routes.route('/images/<file_id>')
 def serve_image(file_id):
+    size = request.args.get('size')
+    image_format = request.args.get('format', 'original')
+    if size is not None and size not in images.IMAGE_VARIANTS:
+        return jsonify({"error": f"size must be one of {', '.join(images.IMAGE_VARIANTS)}"}), 400
+    if image_format not in ('webp', 'original', 'auto'):
+        return jsonify({"error": "format must be webp, original or auto"}), 400
+
+    negotiated = image_format == 'auto'
+    if negotiated:
+        image_format = 'webp' if request.accept_mimetypes['image/webp'] else 'original'
+
     try:
-        # Find file in GridFS
-        file_data = fs.get(ObjectId(file_id))
-        
-        # Create response with proper content type
-        response = send_file(
-            file_data,
-            mimetype=file_data.content_type,
-            as_attachment=False,
-            download_name=file_data.filename
-        )
-        
-        return response
+        # Find the variant in GridFS and stream it with the content type it was stored with
+        variant_id = images.variantFileId(file_id, size, image_format)
+        response = gridfsResponse(db.fs.get(ObjectId(variant_id)))
     except Exception as e:
         return jsonify({"error": str(e)}), 404
+    if negotiated:
+        response.vary.add('Accept')
+    return response
     
 # Health check endpoint
-@app.route('/api/status', methods=['GET'])
+@quiz_routes.route('/api/status', methods=['GET'])
 def status():
     return jsonify({
         "status": "ok",
         "environment": os.environ.get('RAILWAY_ENVIRONMENT', 'local'),
         "memory_limit": os.environ.get('RAILWAY_MEMORY_LIMIT', 'unknown'),
         "cpu_limit": os.environ.get('RAILWAY_CPU_LIMIT', 'unknown'),
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "caches": cacheStats()
     })
 
+# Build the app, gunicorn serves app:app
+app = create_app(blueprints=[quiz_routes])
+
 if __name__ == '__main__':
     app.run(debug=True, port=9090) # run the server in debug mode
\ No newline at end of file
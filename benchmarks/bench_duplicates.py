@@ -0,0 +1,62 @@
+# Benchmark near-duplicate lookups against a large question bank.
+# Seeds one user's bank of question_count questions in a scratch database (BENCH_DATABASE,
+# default Quizbenchmark) and times findDuplicates for a generated batch, showing how many
+# candidates the (scope, bands) index returns compared with the size of the bank.
+#
+#   python benchmarks/bench_duplicates.py [question_count]
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db # import db
+import questionindex
+from indexes import INDEXES
+from pymongo import IndexModel
+
+QUESTION_COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+WORDS = ("network protocol layer packet routing address server client cache memory process thread kernel "
+         "database index query transaction variable function class object inheritance recursion algorithm").split()
+
+def random_question(rng):
+    return f"Which {' '.join(rng.sample(WORDS, 6))} statement about {rng.choice(WORDS)} is correct?"
+
+if __name__ == '__main__':
+    rng = random.Random(1)
+    database = db.client[os.environ.get('BENCH_DATABASE', 'Quizbenchmark')]
+    questionindex.indexCollection = lambda: database.questionindex
+    database.questionindex.drop()
+    database.questionindex.create_indexes([IndexModel(keys, **options) for keys, options in INDEXES['questionindex']])
+
+    print(f"Indexing {QUESTION_COUNT} questions into {database.name}")
+    start = time.perf_counter()
+    bank = []
+    for quiz in range(QUESTION_COUNT // 20):
+        bank.append({'_id': f"quiz-{quiz}", 'userId': 'bench-user', 'questions': [
+            {'id': str(q), 'question': random_question(rng)} for q in range(20)
+        ]})
+        if len(bank) == 100:
+            questionindex.indexQuizzes(bank)
+            bank = []
+    if bank:
+        questionindex.indexQuizzes(bank)
+    print(f"Indexed in {time.perf_counter() - start:.1f}s")
+
+    # A generated batch: half rephrasings of saved questions, half new
+    saved = [doc['text'] for doc in database.questionindex.aggregate([{'$sample': {'size': 10}}])]
+    batch = [{'question': text.replace('Which', 'Which one')} for text in saved]
+    batch += [{'question': random_question(rng)} for _ in range(10)]
+    scopes = questionindex.scopesFor('bench-user')
+
+    start = time.perf_counter()
+    matches = questionindex.findDuplicates(batch, scopes)
+    elapsed = time.perf_counter() - start
+
+    bands = sorted({key for question in batch for key in questionindex.bandKeys(questionindex.signature(question['question']))})
+    candidates = database.questionindex.count_documents({'scope': {'$in': scopes}, 'bands': {'$in': bands}})
+    print(f"findDuplicates for {len(batch)} questions: {elapsed * 1000:.0f} ms, "
+          f"{candidates} candidates read out of {QUESTION_COUNT}, {sum(1 for found in matches if found)} flagged as duplicates")
+
+    db.client.drop_database(database.name)
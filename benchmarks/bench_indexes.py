@@ -0,0 +1,55 @@
+# Benchmark the hot quiz queries before and after the declared indexes are created.
+# Seeds a scratch database (BENCH_DATABASE, default Quizbenchmark) on the configured MongoDB,
+# explains each query with no secondary indexes, runs ensureIndexes and explains again.
+#
+#   python benchmarks/bench_indexes.py [quiz_count]
+import os
+import sys
+import random
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db # import db
+from indexes import ensureIndexes, explainQueries
+
+QUIZ_COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+CATEGORIES = ["Programming", "Mathematics", "Science", "History", "Language", "General Knowledge", "Custom"]
+
+def seed(database):
+    database.quizcollection.drop()
+    database.categories.drop()
+    users = [f"user-{i}" for i in range(QUIZ_COUNT // 20 or 1)]
+    batch = []
+    for i in range(QUIZ_COUNT):
+        batch.append({
+            'title': f"Quiz {i}",
+            'description': "Benchmark quiz",
+            'questions': [{'id': str(q), 'question': f"Question {q}", 'options': ['a', 'b', 'c', 'd'], 'correctAnswer': 'a'} for q in range(10)],
+            'category': random.choice(CATEGORIES),
+            'userId': random.choice(users),
+            'created_at': datetime.now()
+        })
+        if len(batch) == 1000:
+            database.quizcollection.insert_many(batch)
+            batch = []
+    if batch:
+        database.quizcollection.insert_many(batch)
+    database.categories.insert_many([{'name': f"Category {i}"} for i in range(500)])
+
+def show(title, plans):
+    print(f"\n{title}")
+    print(f"{'query':34} {'plan':48} {'keys':>8} {'docs':>8} {'ms':>6}")
+    for label, plan in plans.items():
+        print(f"{label:34} {plan['plan'][:48]:48} {str(plan['keysExamined']):>8} {str(plan['docsExamined']):>8} {str(plan['millis']):>6}")
+
+if __name__ == '__main__':
+    database = db.client[os.environ.get('BENCH_DATABASE', 'Quizbenchmark')]
+    print(f"Seeding {QUIZ_COUNT} quizzes into {database.name}")
+    seed(database)
+
+    show("Before (no secondary indexes)", explainQueries(database))
+    ensureIndexes(database)
+    show("After ensureIndexes()", explainQueries(database))
+
+    db.client.drop_database(database.name)
@@ -0,0 +1,62 @@
+# Compare generation latency with and without hedging, against benchmarks/fake_provider.py
+# so no tokens are spent. The fake server is started in-process with a slow tail and some failures.
+#
+#   python benchmarks/bench_providers.py [requests] [hedge_after_seconds]
+import os
+import sys
+import time
+import threading
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+HEDGE_AFTER = float(sys.argv[2]) if len(sys.argv) > 2 else 1.5
+
+import fake_provider
+
+options = fake_provider.parse_args(['--port', '8765', '--latency', '0.3', '--slow-rate', '0.15', '--slow-latency', '5', '--fail-rate', '0.05'])
+server = fake_provider.serve(options)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+# providers.py reads these on import
+os.environ['OPENAI_BASE_URL'] = f'http://127.0.0.1:{options.port}/v1'
+os.environ['ANTHROPIC_BASE_URL'] = f'http://127.0.0.1:{options.port}'
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+os.environ.setdefault('ANTHROPIC_API_KEY', 'benchmark')
+os.environ.setdefault('PROVIDER_RETRY_BACKOFF', '0.1')
+
+import providers
+from quizparser import parseQuiz
+
+MESSAGES = [{'role': 'user', 'content': 'Generate a beginner level quiz with 1 question about HTTP'}]
+CALLS = [
+    ('gpt', {'model': 'gpt-3.5-turbo', 'messages': MESSAGES}),
+    ('claude', {'model': 'claude-3-7-sonnet-20250219', 'messages': MESSAGES, 'max_tokens': 4000}),
+]
+
+def parse(text):
+    quiz, errors = parseQuiz(text)
+    if quiz is None:
+        raise ValueError('; '.join(errors))
+    return quiz
+
+def run(label, calls, hedge_after):
+    timings = []
+    answered = {}
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        provider, _ = providers.completeHedged(calls, parse=parse, hedge_after=hedge_after)
+        timings.append(time.perf_counter() - start)
+        answered[provider] = answered.get(provider, 0) + 1
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label}: median {statistics.median(timings) * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms, "
+          f"max {timings[-1] * 1000:.0f} ms, answered by {answered}")
+
+if __name__ == '__main__':
+    run('gpt only', CALLS[:1], hedge_after=None)
+    run(f'gpt hedged with claude after {HEDGE_AFTER}s', CALLS, hedge_after=HEDGE_AFTER)
+    server.shutdown()
@@ -0,0 +1,101 @@
+# Benchmark /api/quizzes/search against a realistic corpus.
+# Seeds quiz_count quizzes of 10 questions each in a scratch database (BENCH_DATABASE, default
+# Quizbenchmark), creates the declared indexes and times searchQuizzes for a few typical searches,
+# next to a case-insensitive $regex scan over the same fields as the unindexed baseline.
+#
+#   python benchmarks/bench_search.py [quiz_count] [runs]
+import os
+import re
+import sys
+import time
+import random
+import statistics
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db # import db
+from indexes import ensureIndexes
+from models.quizModel import searchQuizzes
+
+QUIZ_COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+RUNS = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+CATEGORIES = ["Programming", "Mathematics", "Science", "History", "Language", "General Knowledge", "Custom"]
+AI_MODELS = ["gpt", "claude", "gemini", None]
+# Topic words are drawn with a skew so some are common and most are rare, like real quiz titles
+TOPICS = ("photosynthesis mitochondria algebra calculus recursion inheritance polymorphism revolution empire "
+          "grammar vocabulary fractions geometry electricity magnetism evolution genetics database networking "
+          "encryption compiler probability statistics renaissance democracy volcano climate chemistry atoms").split()
+FILLER = "what which how does the of a in is are explain describe best following statement about true".split()
+
+SEARCHES = [
+    ('one common word', 'photosynthesis', {}),
+    ('one rare word', 'volcano', {}),
+    ('two words', 'recursion compiler', {}),
+    ('phrase', '"cell membrane"', {}),
+    ('word + category', 'algebra', {'category': 'Mathematics'}),
+    ('word + user', 'genetics', {'userId': 'user-7'}),
+]
+
+def topic(rng):
+    return TOPICS[min(int(rng.expovariate(0.15)), len(TOPICS) - 1)]
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(FILLER) for _ in range(words)) + ' ' + topic(rng)
+
+def seed(database, rng):
+    database.quizcollection.drop()
+    users = [f"user-{i}" for i in range(QUIZ_COUNT // 20 or 1)]
+    batch = []
+    for i in range(QUIZ_COUNT):
+        batch.append({
+            'title': f"{topic(rng).title()} and {topic(rng)} quiz {i}",
+            'description': sentence(rng, 8) + (' cell membrane' if rng.random() < 0.01 else ''),
+            'questions': [{'id': str(q), 'question': sentence(rng, 10) + '?', 'options': ['a', 'b', 'c', 'd'], 'correctAnswer': 'a'} for q in range(10)],
+            'category': rng.choice(CATEGORIES),
+            'aiModel': rng.choice(AI_MODELS),
+            'userId': rng.choice(users),
+            'created_at': datetime.now()
+        })
+        if len(batch) == 1000:
+            database.quizcollection.insert_many(batch)
+            batch = []
+    if batch:
+        database.quizcollection.insert_many(batch)
+
+def regex_scan(database, text, filters, limit):
+    pattern = re.compile('|'.join(re.escape(word) for word in text.strip('"').split()), re.IGNORECASE)
+    query = dict(filters, **{'$or': [{'title': pattern}, {'description': pattern}, {'questions.question': pattern}]})
+    return list(database.quizcollection.find(query, {'questions': 0}).limit(limit))
+
+def timed(call):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = call()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return result, statistics.median(timings) * 1000, timings[max(0, int(len(timings) * 0.95) - 1)] * 1000
+
+if __name__ == '__main__':
+    rng = random.Random(1)
+    database = db.client[os.environ.get('BENCH_DATABASE', 'Quizbenchmark')]
+    db._handles['quizdb'] = database # searchQuizzes reads db.quizdb
+
+    print(f"Seeding {QUIZ_COUNT} quizzes into {database.name}")
+    seed(database, rng)
+    start = time.perf_counter()
+    ensureIndexes(database)
+    print(f"Indexes built in {time.perf_counter() - start:.1f}s")
+
+    print(f"\n{'search':18} {'hits':>5} {'text p50':>9} {'text p95':>9} {'regex p50':>10} {'next page p50':>14}")
+    for label, text, filters in SEARCHES:
+        (quizzes, cursor), median, p95 = timed(lambda: searchQuizzes(text, filters, limit=20))
+        _, regex_median, _ = timed(lambda: regex_scan(database, text, filters, 20))
+        next_page = '-'
+        if cursor:
+            _, page_median, _ = timed(lambda: searchQuizzes(text, filters, limit=20, after=cursor))
+            next_page = f"{page_median:.1f}"
+        print(f"{label:18} {len(quizzes):>5} {median:>9.1f} {p95:>9.1f} {regex_median:>10.1f} {next_page:>14}")
+
+    db.client.drop_database(database.name)
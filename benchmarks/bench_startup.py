@@ -0,0 +1,32 @@
+# Measure cold start: how long a fresh interpreter takes to import app.py and build the Flask app,
+# which is what every gunicorn worker pays on boot and on each recycle.
+#
+#   python benchmarks/bench_startup.py [runs]
+import os
+import sys
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+PROBE = """
+import time
+start = time.perf_counter()
+import app
+print(time.perf_counter() - start)
+"""
+
+if __name__ == '__main__':
+    env = dict(os.environ)
+    # config.py needs these set, the values don't matter since nothing connects at import
+    env.setdefault('MONGODB_URI', 'mongodb://localhost:27017')
+    env.setdefault('OPENAI_API_KEY', 'benchmark')
+
+    timings = []
+    for _ in range(RUNS):
+        result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+
+    print(f"import app over {RUNS} runs: min {min(timings) * 1000:.0f} ms, "
+          f"median {statistics.median(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms")
@@ -0,0 +1,96 @@
+# Local stand-in for the OpenAI and Anthropic APIs, for exercising providers.py without spending tokens.
+# Answers chat completions and messages requests with a canned quiz after a configurable delay,
+# with a share of slow (tail latency) and failing (503) responses.
+# Streaming requests (/api/generate-quiz-stream) are not faked.
+#
+#   python benchmarks/fake_provider.py [--port 8765] [--latency 0.5] [--slow-rate 0.1] [--slow-latency 10] [--fail-rate 0.05]
+#
+# then point the service at it:
+#
+#   OPENAI_BASE_URL=http://localhost:8765/v1 ANTHROPIC_BASE_URL=http://localhost:8765 python app.py
+import json
+import time
+import random
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+QUIZ = {
+    'title': 'Fake Quiz',
+    'description': 'Generated by the fake provider',
+    'questions': [
+        {
+            'id': '1',
+            'question': 'What does HTTP stand for?',
+            'options': ['HyperText Transfer Protocol', 'High Transfer Text Protocol', 'Hyperlink Text Protocol', 'Host Transfer Protocol'],
+            'correctAnswer': 'HyperText Transfer Protocol',
+            'explanation': 'HTTP is the HyperText Transfer Protocol.'
+        }
+    ]
+}
+
+VALIDATION = {
+    'score': 90,
+    'feedback': [],
+    'difficulty_alignment': 90,
+    'overall_feedback': 'Looks good'
+}
+
+def make_handler(options):
+    class FakeProvider(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            prompt = json.dumps(request.get('messages', []))
+            text = json.dumps(VALIDATION if 'quiz validator' in prompt else QUIZ)
+
+            slow = random.random() < options.slow_rate
+            time.sleep(options.slow_latency if slow else options.latency * random.uniform(0.8, 1.2))
+            if random.random() < options.fail_rate:
+                self.send_json(503, {'error': {'type': 'overloaded_error', 'message': 'Fake provider overloaded'}})
+                return
+
+            if self.path.rstrip('/').endswith('/chat/completions'):
+                self.send_json(200, {
+                    'id': 'chatcmpl-fake', 'object': 'chat.completion', 'created': int(time.time()), 'model': request.get('model'),
+                    'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': text}}],
+                    'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+                })
+            elif self.path.rstrip('/').endswith('/messages'):
+                self.send_json(200, {
+                    'id': 'msg_fake', 'type': 'message', 'role': 'assistant', 'model': request.get('model'),
+                    'content': [{'type': 'text', 'text': text}], 'stop_reason': 'end_turn',
+                    'usage': {'input_tokens': 0, 'output_tokens': 0}
+                })
+            else:
+                self.send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+    return FakeProvider
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Fake OpenAI/Anthropic provider')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help='typical response time in seconds')
+    parser.add_argument('--slow-rate', type=float, default=0.1, help='share of responses that take --slow-latency')
+    parser.add_argument('--slow-latency', type=float, default=10.0)
+    parser.add_argument('--fail-rate', type=float, default=0.05, help='share of responses that fail with 503')
+    return parser.parse_args(argv)
+
+def serve(options):
+    server = ThreadingHTTPServer(('127.0.0.1', options.port), make_handler(options))
+    server.daemon_threads = True
+    return server
+
+if __name__ == '__main__':
+    options = parse_args()
+    print(f"Fake provider on http://127.0.0.1:{options.port}")
+    serve(options).serve_forever()
@@ -0,0 +1,108 @@
+import copy
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from collections import OrderedDict
+
+# Build a stable cache key from any JSON-serialisable parts
+def cacheKey(*parts):
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+# Collapse whitespace so trivially different copies of the same text share a key
+def normalizeText(text):
+    return ' '.join(str(text or '').split())
+
+# Thread-safe in-process LRU cache with optional per-entry TTL (seconds)
+class LRUCache:
+    def __init__(self, maxsize=256, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+# Two-tier cache, an in-process LRU in front of a MongoDB collection with TTL eviction
+class MongoBackedCache:
+    # collection can be a collection or a function returning one, so the database is only touched on first use
+    def __init__(self, collection, maxsize=128, ttl=7 * 24 * 60 * 60):
+        self._collection = collection
+        self.ttl = ttl
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        # MongoDB removes entries once expires_at has passed, through the TTL index declared in indexes.py
+
+    @property
+    def collection(self):
+        return self._collection() if callable(self._collection) else self._collection
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            return copy.deepcopy(value)
+
+        doc = self.collection.find_one({'_id': key, 'expires_at': {'$gt': datetime.now()}})
+        if doc is None:
+            return None
+        self.local.set(key, doc['value'])
+        return copy.deepcopy(doc['value'])
+
+    def set(self, key, value):
+        value = copy.deepcopy(value)
+        self.local.set(key, value)
+        now = datetime.now()
+        self.collection.replace_one(
+            {'_id': key},
+            {'_id': key, 'value': value, 'created_at': now, 'expires_at': now + timedelta(seconds=self.ttl)},
+            upsert=True
+        )
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.collection.delete_one({'_id': key})
+
+    def stats(self):
+        return self.local.stats()
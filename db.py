@@ -1,5 +1,6 @@
 import pymongo # import pymongo for database connection
 from gridfs import GridFS # import GridFS for file storage
+import threading
 import os
 
 # Try to import from config, fall back to environment variable if config not available
@@ -8,35 +9,44 @@ try:
 except ImportError:
     # When deployed, get from environment variable
     MONGODB_URI = os.environ.get('MONGODB_URI')
-    
+
     if not MONGODB_URI:
         raise ValueError("MONGODB_URI environment variable not set")
 
-# Create database connections
-client = pymongo.MongoClient(MONGODB_URI) # create a client
-quizdb = client.get_database('Quizdatabase') # get the database
-userdb = client.get_database('userdatabase') # get the database
-notesdb = client.get_database('notesdatabase') # get the database
-
-user_collection = userdb.usercollection # get the user collection
-quiz_collection = quizdb.quizcollection # get the quiz collection
-notes_collection = notesdb.notescollection # get the notes collection
+# Database handles are created on first use (db.quizdb, from db import fs, ...) rather than at import,
+# so importing the app doesn't resolve DNS or open connections. Indexes are declared in indexes.py.
+_handles = {}
+_lock = threading.Lock()
 
-# Initialize GridFS for file storage
-fs = GridFS(quizdb)
+def _connect():
+    client = pymongo.MongoClient(MONGODB_URI) # create a client
+    quizdb = client.get_database('Quizdatabase') # get the database
+    userdb = client.get_database('userdatabase') # get the database
+    notesdb = client.get_database('notesdatabase') # get the database
 
-# index creation for image URLs and metadata, to speed up queries
-quizdb.quizcollection.create_index([
-    ('questions.imageUrl', pymongo.ASCENDING),
-    ('questions.imageMetadata.uploadDate', pymongo.ASCENDING)
-])
+    return {
+        'client': client,
+        'quizdb': quizdb,
+        'userdb': userdb,
+        'notesdb': notesdb,
+        'user_collection': userdb.usercollection, # get the user collection
+        'quiz_collection': quizdb.quizcollection, # get the quiz collection
+        'notes_collection': notesdb.notescollection, # get the notes collection
+        'image_collection': quizdb.imagecollection, # collection for tracking image metadata
+        'fs': GridFS(quizdb), # GridFS for file storage
+    }
 
-# collection creation for tracking image metadata
-image_collection = quizdb.imagecollection
-image_collection.create_index([
-    ('url', pymongo.ASCENDING),
-    ('uploadDate', pymongo.ASCENDING)
-])
+def __getattr__(name):
+    if name.startswith('__'):
+        raise AttributeError(name)
+    if not _handles:
+        with _lock:
+            if not _handles:
+                _handles.update(_connect())
+    if name in _handles:
+        return _handles[name]
+    raise AttributeError(f"module 'db' has no attribute '{name}'")
 
 # Test connection
-client.server_info()
\ No newline at end of file
+def ping():
+    return __getattr__('client').server_info()
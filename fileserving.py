@@ -0,0 +1,102 @@
+import os
+from datetime import timezone
+from flask import request, Response
+from werkzeug.datastructures import ContentRange
+
+# Serve files stored in GridFS: HTTP Range (206) so PDF viewers can seek, ETag/Last-Modified
+# conditional requests (304), long-lived cache headers, and the body streamed chunk by chunk
+# so a worker never holds a whole file in memory.
+
+# GridFS files are never changed in place, a new upload gets a new ID, so clients can keep them
+FILE_CACHE_MAX_AGE = int(os.environ.get('FILE_CACHE_MAX_AGE', 365 * 24 * 60 * 60))
+
+# ETag of a stored file, the content hash when we recorded one, otherwise the md5 GridFS kept,
+# otherwise the ID and length (a file under one ID never changes)
+def fileEtag(grid_out):
+    return getattr(grid_out, 'contentHash', None) or getattr(grid_out, 'md5', None) or f"{grid_out._id}-{grid_out.length}"
+
+# upload_date as a timezone-aware datetime to the second, the precision of Last-Modified
+def lastModified(grid_out):
+    upload_date = grid_out.upload_date
+    if upload_date is None:
+        return None
+    if upload_date.tzinfo is None:
+        upload_date = upload_date.replace(tzinfo=timezone.utc) # GridFS stores UTC
+    return upload_date.replace(microsecond=0)
+
+# Yield length bytes from start, one GridFS chunk per read
+def streamFile(grid_out, start, length):
+    try:
+        grid_out.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = grid_out.read(min(grid_out.chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        grid_out.close()
+
+# Whether the client's copy is still current
+def notModified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag) # If-None-Match wins over If-Modified-Since
+    return bool(last_modified and request.if_modified_since and request.if_modified_since >= last_modified)
+
+# Range the client asked for as (start, stop), None for the whole file. Raises ValueError if it can't be satisfied.
+def requestedRange(etag, last_modified, length):
+    if request.range is None:
+        return None
+    # If-Range: only send part of the file if it is still the version the client has the rest of
+    if_range = request.if_range
+    if if_range.etag is not None and if_range.etag != etag:
+        return None
+    if if_range.date is not None and (last_modified is None or if_range.date != last_modified):
+        return None
+    byte_range = request.range.range_for_length(length)
+    if byte_range is None:
+        raise ValueError("Requested range not satisfiable")
+    return byte_range
+
+# Build the response for a GridFS file, mimetype defaults to the content type it was stored with
+def gridfsResponse(grid_out, mimetype=None, max_age=FILE_CACHE_MAX_AGE):
+    etag = fileEtag(grid_out)
+    last_modified = lastModified(grid_out)
+    length = grid_out.length
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': f'public, max-age={max_age}, immutable',
+        'Content-Disposition': f'inline; filename="{grid_out.filename or grid_out._id}"'
+    }
+
+    if notModified(etag, last_modified):
+        grid_out.close()
+        response = Response(status=304, headers=headers)
+    else:
+        try:
+            byte_range = requestedRange(etag, last_modified, length)
+        except ValueError:
+            grid_out.close()
+            response = Response(status=416, headers=headers)
+            response.content_range = ContentRange('bytes', None, None, length)
+            response.set_etag(etag)
+            return response
+
+        start, stop = byte_range or (0, length)
+        response = Response(
+            streamFile(grid_out, start, stop - start),
+            status=206 if byte_range else 200,
+            mimetype=mimetype or grid_out.content_type or 'application/octet-stream',
+            headers=headers,
+            direct_passthrough=True
+        )
+        response.content_length = stop - start
+        if byte_range:
+            response.content_range = ContentRange('bytes', start, stop, length)
+
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
@@ -0,0 +1,58 @@
+# Grading of quiz attempts against a compiled answer key.
+# A key maps question id -> {'answers': frozenset of correct options, 'multi': isMultiAnswer}
+
+# Turn a stored or submitted answer (a string or a list of strings) into a set of options
+def answerSet(answer):
+    if answer is None:
+        return frozenset()
+    if isinstance(answer, (list, tuple, set, frozenset)):
+        return frozenset(str(option).strip() for option in answer if option is not None)
+    return frozenset([str(answer).strip()])
+
+# Compile the answer key from a quiz's questions
+def compileAnswerKey(questions):
+    return {
+        str(question.get('id')): {
+            'answers': answerSet(question.get('correctAnswer')),
+            'multi': bool(question.get('isMultiAnswer', False))
+        }
+        for question in questions
+    }
+
+# Grade one submission: {'answers': {questionId: answer}}. Results say which questions were right but
+# never what the right answers are, so grading can't be used to read the answer key.
+# questionIds are the questions the attempt was given, worked out by the server (see getAttemptQuestionIds),
+# never taken from the submission, so leaving a question out counts it as wrong. None grades the whole key.
+def gradeSubmission(key, submission, questionIds=None):
+    answers = {str(question_id): answer for question_id, answer in (submission.get('answers') or {}).items()}
+    question_ids = [str(question_id) for question_id in (key.keys() if questionIds is None else questionIds)]
+
+    results = []
+    correct_count = 0
+    for question_id in question_ids:
+        entry = key.get(question_id)
+        if entry is None:
+            results.append({'questionId': question_id, 'correct': False, 'error': 'Unknown question'})
+            continue
+
+        given = answerSet(answers.get(question_id))
+        # Single-answer questions take the one chosen option, multi-answer ones must match the whole set
+        correct = given == entry['answers'] if entry['multi'] else len(given) == 1 and given <= entry['answers']
+        correct_count += correct
+        results.append({
+            'questionId': question_id,
+            'correct': correct,
+            'answered': bool(given)
+        })
+
+    total = len(question_ids)
+    graded = {
+        'correct': correct_count,
+        'total': total,
+        'score': round(100 * correct_count / total, 2) if total else 0,
+        'questions': results
+    }
+    for field in ('attemptId', 'userId'): # echo identifiers so bulk results can be matched up
+        if field in submission:
+            graded[field] = submission[field]
+    return graded
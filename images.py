@@ -0,0 +1,175 @@
+import io
+import os
+import hashlib
+from datetime import datetime
+import db # import db
+from cache import LRUCache
+
+# Uploaded images are stored once per content hash and resized into variants at upload time,
+# so question renders fetch a few hundred KB of WebP rather than the original phone photo.
+# Metadata lives in imagecollection, keyed by the GridFS ID of the original (the ID in /images/<id>):
+#   {'fileId', 'contentHash', 'url', 'filename', 'contentType', 'width', 'height', 'uploadDate',
+#    'webp': fileId of the full-size WebP copy, 'variants': {size: {'width', 'height', 'webp': fileId, 'original': fileId}}}
+# Pillow is optional, without it only the original is stored and served.
+
+# Longest side in pixels of each variant, variants are only made if smaller than the original
+IMAGE_VARIANTS = {
+    'thumb': 160,
+    'small': 480,
+    'medium': 960,
+    'large': 1600,
+}
+WEBP_QUALITY = int(os.environ.get('IMAGE_WEBP_QUALITY', 80))
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 50_000_000)) # refuse decompression bombs
+
+# Pillow format and content type for the non-WebP copy of each variant
+ORIGINAL_FORMATS = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+}
+# Formats stored as another one. Many phone cameras save JPEGs with a second preview frame that
+# Pillow opens as MPO, only the first frame is kept.
+FORMAT_ALIASES = {
+    'MPO': 'JPEG',
+}
+
+# Image metadata never changes once stored, so lookups for /images/<id> are cached
+image_cache = LRUCache(maxsize=int(os.environ.get('IMAGE_CACHE_SIZE', 2048)))
+
+def contentHash(content):
+    return hashlib.sha256(content).hexdigest()
+
+# Encode one resized copy of image, returns (bytes, width, height)
+def encodeVariant(image, max_side, image_format):
+    from PIL import Image
+
+    variant = image.copy()
+    variant.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    if image_format == 'JPEG' and variant.mode not in ('RGB', 'L'):
+        variant = variant.convert('RGB')
+    output = io.BytesIO()
+    if image_format == 'WEBP':
+        variant.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+    else:
+        variant.save(output, image_format, optimize=True)
+    return output.getvalue(), variant.width, variant.height
+
+# Open an upload with Pillow, upright per its EXIF orientation. Returns (image, format), image is None
+# if Pillow isn't installed or the image can't be resized (animated GIFs are served as uploaded).
+def openImage(content):
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        print("Pillow not installed, storing images without variants")
+        return None, None
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    try:
+        image = Image.open(io.BytesIO(content))
+        image_format = FORMAT_ALIASES.get(image.format, image.format)
+        if image_format != image.format:
+            image.seek(0)
+        elif getattr(image, 'is_animated', False) or image_format not in ORIGINAL_FORMATS:
+            return None, image_format
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except (Image.UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ValueError(f"Invalid image: {str(e)}")
+    return image, image_format
+
+# Store the resized variants of an image in GridFS, returns the variants map for imagecollection
+def storeVariants(image, image_format, filename, contentHash):
+    variants = {}
+    for size, max_side in IMAGE_VARIANTS.items():
+        if max(image.width, image.height) <= max_side:
+            continue # never upscale, the original serves this size
+        variant = {}
+        for key, variant_format, content_type in (('webp', 'WEBP', 'image/webp'), ('original', image_format, ORIGINAL_FORMATS[image_format])):
+            data, width, height = encodeVariant(image, max_side, variant_format)
+            variant[key] = str(db.fs.put(
+                data,
+                filename=f"{size}-{filename}",
+                content_type=content_type,
+                variantOf=contentHash
+            ))
+        variant.update(width=width, height=height)
+        variants[size] = variant
+    return variants
+
+# Store an uploaded image and its variants. An image already uploaded (same content hash)
+# is not stored again, its existing record is returned. Raises ValueError if it isn't a readable image.
+def storeImage(content, filename, content_type, base_url):
+    from pymongo.errors import DuplicateKeyError
+
+    content_hash = contentHash(content)
+    existing = db.image_collection.find_one({'contentHash': content_hash}, {'_id': 0})
+    if existing:
+        return existing
+
+    image, image_format = openImage(content)
+    file_id = db.fs.put(content, filename=filename, content_type=content_type, contentHash=content_hash)
+    record = {
+        'fileId': str(file_id),
+        'contentHash': content_hash,
+        'url': f"{base_url}/images/{file_id}",
+        'filename': filename,
+        'contentType': content_type,
+        'size': len(content),
+        'uploadDate': datetime.now(),
+        'variants': {}
+    }
+    if image is not None:
+        record.update(width=image.width, height=image.height)
+        record['variants'] = storeVariants(image, image_format, filename, content_hash)
+        data, _, _ = encodeVariant(image, max(image.width, image.height), 'WEBP')
+        record['webp'] = str(db.fs.put(data, filename=f"webp-{filename}", content_type='image/webp', variantOf=content_hash))
+
+    try:
+        db.image_collection.insert_one(record)
+    except DuplicateKeyError:
+        # The same image was uploaded concurrently, keep the first copy and drop ours
+        deleteFiles(record)
+        return db.image_collection.find_one({'contentHash': content_hash}, {'_id': 0})
+    record.pop('_id', None)
+    return record
+
+# Remove the GridFS files of an image record
+def deleteFiles(record):
+    from bson import ObjectId
+
+    file_ids = [record['fileId']] + ([record['webp']] if record.get('webp') else [])
+    for variant in record.get('variants', {}).values():
+        file_ids += [variant[key] for key in ('webp', 'original') if key in variant]
+    for file_id in file_ids:
+        db.fs.delete(ObjectId(file_id))
+
+# Get the image record for the GridFS ID in /images/<id>, None for images uploaded before variants existed
+def getImage(file_id):
+    record = image_cache.get(file_id)
+    if record is None:
+        record = db.image_collection.find_one({'fileId': file_id}, {'_id': 0})
+        if record is None:
+            return None
+        image_cache.set(file_id, record)
+    return record
+
+# Pick the GridFS file to serve for a size and format ('webp' or 'original').
+# Without a size the image is served at full size, as WebP if a WebP copy was stored.
+# Falls back to the next larger variant, then the original, when a size wasn't made.
+def variantFileId(file_id, size=None, image_format='original'):
+    if size is None and image_format == 'original':
+        return file_id
+    record = getImage(file_id)
+    if record is None:
+        return file_id
+    if size is None:
+        return record.get(image_format) or file_id # images stored before full-size WebP copies get the original
+
+    sizes = list(IMAGE_VARIANTS)
+    candidates = sizes[sizes.index(size):] if size in IMAGE_VARIANTS else sizes[-1:]
+    for candidate in candidates:
+        variant = record['variants'].get(candidate)
+        if variant and image_format in variant:
+            return variant[image_format]
+    return file_id
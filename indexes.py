@@ -0,0 +1,164 @@
+import sys
+import json
+import pymongo
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+import db # import db
+from jobs import JOB_TTL_SECONDS
+
+# Every index the service relies on, by collection in the quiz database.
+# Each entry is (keys, options) as passed to IndexModel. Index names are left to MongoDB
+# so indexes created before this module existed are recognised rather than duplicated.
+INDEXES = {
+    'quizcollection': [
+        ([('userId', ASCENDING), ('_id', DESCENDING)], {}), # getAll / listings by user, newest first
+        ([('category', ASCENDING), ('_id', DESCENDING)], {}), # listings by category, newest first
+        ([('questions.imageUrl', ASCENDING), ('questions.imageMetadata.uploadDate', ASCENDING)], {}),
+        # /api/quizzes/search. A collection can only have one text index. language_override is moved off
+        # 'language' so a quiz with a language field MongoDB doesn't know can still be saved.
+        ([('title', TEXT), ('description', TEXT), ('questions.question', TEXT)],
+         {'weights': {'title': 10, 'description': 4, 'questions.question': 1}, 'default_language': 'english', 'language_override': 'textLanguage'}),
+    ],
+    'categories': [
+        ([('name', ASCENDING)], {}), # distinct('name') in getCategories is answered from the index
+    ],
+    'imagecollection': [
+        ([('url', ASCENDING), ('uploadDate', ASCENDING)], {}),
+        ([('fileId', ASCENDING)], {}), # /images/<id> variant lookups
+        ([('contentHash', ASCENDING)], {'unique': True, 'partialFilterExpression': {'contentHash': {'$exists': True}}}), # upload dedupe
+    ],
+    'fs.files': [
+        ([('filename', ASCENDING), ('uploadDate', ASCENDING)], {}), # GridFS default
+        ([('contentHash', ASCENDING)], {}), # cached PDF text lookups
+    ],
+    'fs.chunks': [
+        ([('files_id', ASCENDING), ('n', ASCENDING)], {'unique': True}), # GridFS default
+    ],
+    'pdfpages': [
+        ([('contentHash', ASCENDING), ('page', ASCENDING)], {'unique': True}),
+    ],
+    'pdfconcepts': [
+        ([('contentHash', ASCENDING), ('start', ASCENDING), ('end', ASCENDING), ('count', ASCENDING), ('difficulty', ASCENDING)], {'unique': True}),
+    ],
+    'questionindex': [
+        ([('scope', ASCENDING), ('bands', ASCENDING)], {}), # near-duplicate candidate lookups
+        ([('quizId', ASCENDING)], {}), # reindexing a saved quiz
+    ],
+    'generationjobs': [
+        ([('updated_at', ASCENDING)], {'expireAfterSeconds': JOB_TTL_SECONDS}),
+    ],
+    'generationcache': [
+        ([('expires_at', ASCENDING)], {'expireAfterSeconds': 0}),
+    ],
+    'validationcache': [
+        ([('expires_at', ASCENDING)], {'expireAfterSeconds': 0}),
+    ],
+}
+
+# The queries the service runs most, used to check which index each one picks
+def hotQueries(database):
+    sample = database.quizcollection.find_one({}, {'userId': 1, 'category': 1}) or {}
+    return {
+        'getAll (userId)': database.quizcollection.find({'userId': sample.get('userId')}).sort('_id', DESCENDING),
+        'getQuizzesByCategory (category)': database.quizcollection.find({'category': sample.get('category')}).sort('_id', DESCENDING),
+        'getCategories (distinct name)': {'distinct': 'categories', 'key': 'name', 'query': {}},
+        'searchQuizzes (text)': database.quizcollection.find({'$text': {'$search': sample.get('category') or 'quiz'}}),
+    }
+
+# Keys of an index for comparison. MongoDB reports a text index as _fts/_ftsx with the fields in
+# its weights, so text fields are compared by name whichever side they come from.
+def _keyList(keys, weights=None):
+    if weights:
+        return [(field, TEXT) for field in sorted(weights)]
+    keys = list(keys)
+    if any(direction == TEXT for _, direction in keys):
+        return [(field, TEXT) for field in sorted(field for field, _ in keys)]
+    return [(field, direction) for field, direction in keys]
+
+# Create any missing indexes, safe to run on every start. A failure (e.g. an IndexOptionsConflict after a
+# TTL change) is recorded against its index and the rest are still created.
+# Returns {'created': names per collection, 'errors': messages per collection that had failures}.
+def ensureIndexes(database=None):
+    database = database if database is not None else db.quizdb
+    created = {}
+    errors = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = database[collection_name]
+        models = [IndexModel(keys, **options) for keys, options in indexes]
+        try:
+            created[collection_name] = collection.create_indexes(models)
+            continue
+        except pymongo.errors.PyMongoError:
+            pass # retried one at a time below to find the index that failed
+
+        created[collection_name] = []
+        for model in models:
+            try:
+                created[collection_name] += collection.create_indexes([model])
+            except pymongo.errors.PyMongoError as e:
+                errors.setdefault(collection_name, []).append(f"{dict(model.document['key'])}: {str(e)}")
+    return {'created': created, 'errors': errors}
+
+# Compare declared indexes with what exists. Reports declared indexes that are missing,
+# existing ones that aren't declared, and existing ones with no recorded use since the server started.
+def reportIndexes(database=None):
+    database = database if database is not None else db.quizdb
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = database[collection_name]
+        existing = {name: _keyList(info['key'], info.get('weights')) for name, info in collection.index_information().items()}
+        declared = [_keyList(keys) for keys, _ in indexes]
+
+        try:
+            usage = {stat['name']: stat['accesses']['ops'] for stat in collection.aggregate([{'$indexStats': {}}])}
+        except pymongo.errors.OperationFailure:
+            usage = {} # $indexStats needs clusterMonitor on some hosted clusters
+
+        report[collection_name] = {
+            'missing': [keys for keys in declared if keys not in existing.values()],
+            'undeclared': [name for name, keys in existing.items() if name != '_id_' and keys not in declared],
+            'unused': [name for name, ops in usage.items() if ops == 0 and name != '_id_'],
+        }
+    return report
+
+# Summarise the winning plan of each hot query: plan stages, keys/docs examined and time taken.
+# A query the server refuses to plan (e.g. $text before the text index exists) reports its error as the plan.
+def explainQueries(database=None):
+    database = database if database is not None else db.quizdb
+    plans = {}
+    for label, query in hotQueries(database).items():
+        try:
+            if isinstance(query, dict):
+                explain = database.command({'explain': query, 'verbosity': 'executionStats'})
+            else:
+                explain = query.explain()
+        except pymongo.errors.OperationFailure as e:
+            plans[label] = {'plan': f"error: {(e.details or {}).get('errmsg', str(e))}",
+                            'keysExamined': None, 'docsExamined': None, 'returned': None, 'millis': None}
+            continue
+
+        stages = []
+        stage = explain.get('queryPlanner', {}).get('winningPlan', {})
+        while stage:
+            stages.append(stage.get('stage') or stage.get('queryPlan', {}).get('stage'))
+            stage = stage.get('inputStage') or stage.get('queryPlan', {}).get('inputStage')
+        stats = explain.get('executionStats', {})
+        plans[label] = {
+            'plan': ' <- '.join(filter(None, stages)),
+            'keysExamined': stats.get('totalKeysExamined'),
+            'docsExamined': stats.get('totalDocsExamined'),
+            'returned': stats.get('nReturned'),
+            'millis': stats.get('executionTimeMillis'),
+        }
+    return plans
+
+# CLI: python indexes.py ensure|report|explain
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'report'
+    commands = {'ensure': ensureIndexes, 'report': reportIndexes, 'explain': explainQueries}
+    if command not in commands:
+        print("Usage: python indexes.py ensure|report|explain")
+        sys.exit(1)
+    result = commands[command]()
+    print(json.dumps(result, indent=2, default=str))
+    if command == 'ensure' and result['errors']:
+        sys.exit(1)
@@ -1,18 +1,42 @@
+import os
+import threading
 from flask import Flask
 from flask_cors import CORS
 
-# Create Flask app instance
-app = Flask(__name__)
+# Application factory, builds the Flask app and registers the given blueprints
+def create_app(blueprints=()):
+    # Create Flask app instance
+    app = Flask(__name__)
 
-# Configure CORS
-CORS(app, 
-     resources={r"/api/*": {
-         "origins": ["http://localhost:3000", "https://exper-frontend-production.up.railway.app", "https://expergle.com"], 
-         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-         "allow_headers": ["Content-Type", "Authorization", "Accept"],
-         "expose_headers": ["Content-Type", "Authorization"],
-         "supports_credentials": True,
-         "allow_credentials": True,
-         "max_age": 120
-     }},
-     supports_credentials=True)
\ No newline at end of file
+    # Configure CORS
+    CORS(app,
+         resources={r"/api/*": {
+             "origins": ["http://localhost:3000", "https://exper-frontend-production.up.railway.app", "https://expergle.com"],
+             "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+             "allow_headers": ["Content-Type", "Authorization", "Accept", "If-Match", "If-None-Match"],
+             "expose_headers": ["Content-Type", "Authorization", "ETag"],
+             "supports_credentials": True,
+             "allow_credentials": True,
+             "max_age": 120
+         }},
+         supports_credentials=True)
+    CORS(app, supports_credentials=True) # enable CORS
+
+    for blueprint in blueprints:
+        app.register_blueprint(blueprint)
+
+    # Create any missing indexes in the background so worker boot isn't blocked on MongoDB,
+    # set ENSURE_INDEXES_ON_STARTUP=false to only run them with `python indexes.py ensure`
+    if os.environ.get('ENSURE_INDEXES_ON_STARTUP', 'true').lower() == 'true':
+        threading.Thread(target=ensure_indexes_quietly, daemon=True).start()
+
+    return app
+
+def ensure_indexes_quietly():
+    try:
+        from indexes import ensureIndexes # declared MongoDB indexes
+        for collection_name, messages in ensureIndexes()['errors'].items():
+            for message in messages:
+                print(f"Failed to ensure index on {collection_name}: {message}")
+    except Exception as e:
+        print(f"Failed to ensure indexes: {str(e)}")
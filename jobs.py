@@ -0,0 +1,132 @@
+import os
+import time
+import uuid
+import socket
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor # local worker pool for generation jobs
+import db # import db
+
+# Number of generation jobs each gunicorn worker runs at once
+JOB_WORKERS = int(os.environ.get('GENERATION_JOB_WORKERS', 2))
+# Finished jobs are removed by MongoDB after this many seconds
+JOB_TTL_SECONDS = int(os.environ.get('GENERATION_JOB_TTL', 24 * 60 * 60))
+
+# Queued and running jobs get a heartbeat every JOB_HEARTBEAT_SECONDS from the worker that owns them.
+# A job whose heartbeat is older than JOB_STALE_SECONDS lost its worker (restart, gunicorn timeout)
+# and is reported as failed by getJob instead of staying 'running' until the TTL removes it.
+JOB_HEARTBEAT_SECONDS = int(os.environ.get('GENERATION_JOB_HEARTBEAT', 15))
+JOB_STALE_SECONDS = int(os.environ.get('GENERATION_JOB_STALE_AFTER', 4 * JOB_HEARTBEAT_SECONDS))
+
+executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='generation-job')
+active_jobs = set() # IDs of the jobs queued or running in this process
+active_lock = threading.Lock()
+heartbeat_thread = None
+
+# Job state lives in MongoDB so any worker can answer a poll, not just the one running the job
+# (the TTL index on updated_at is declared in indexes.py)
+def jobCollection():
+    return db.quizdb.generationjobs
+
+# Worker that owns the jobs submitted by this process
+def workerId():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+# Refresh heartbeat_at on this process's jobs until it exits
+def heartbeatLoop():
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        with active_lock:
+            job_ids = list(active_jobs)
+        if not job_ids:
+            continue
+        try:
+            jobCollection().update_many({'_id': {'$in': job_ids}}, {'$set': {'heartbeat_at': datetime.now()}})
+        except Exception as e:
+            print(f"Generation job heartbeat failed: {str(e)}")
+
+# Start the heartbeat thread, again in a forked worker where the parent's thread doesn't exist
+def startHeartbeat():
+    global heartbeat_thread
+    with active_lock:
+        if heartbeat_thread is None or not heartbeat_thread.is_alive():
+            heartbeat_thread = threading.Thread(target=heartbeatLoop, daemon=True, name='generation-job-heartbeat')
+            heartbeat_thread.start()
+
+# Create a job record and hand the work to the pool, returns the job ID
+def submitJob(kind, payload, target):
+    job_id = str(uuid.uuid4())
+    now = datetime.now()
+    jobCollection().insert_one({
+        '_id': job_id,
+        'kind': kind,
+        'status': 'queued',
+        'progress': {'stage': 'queued'},
+        'result': None,
+        'error': None,
+        'worker': workerId(),
+        'created_at': now,
+        'updated_at': now,
+        'heartbeat_at': now
+    })
+    startHeartbeat()
+    with active_lock:
+        active_jobs.add(job_id)
+    executor.submit(runJob, job_id, payload, target)
+    return job_id
+
+# Run a job on the pool, target is called as target(payload, progress)
+def runJob(job_id, payload, target):
+    def progress(stage, **details):
+        jobCollection().update_one({'_id': job_id}, {'$set': {
+            'progress': {'stage': stage, **details},
+            'updated_at': datetime.now()
+        }})
+
+    try:
+        jobCollection().update_one({'_id': job_id}, {'$set': {
+            'status': 'running',
+            'worker': workerId(),
+            'started_at': datetime.now(),
+            'updated_at': datetime.now(),
+            'heartbeat_at': datetime.now()
+        }})
+        result = target(payload, progress)
+        jobCollection().update_one({'_id': job_id}, {'$set': {
+            'status': 'done',
+            'progress': {'stage': 'done'},
+            'result': result,
+            'updated_at': datetime.now()
+        }})
+    except Exception as e:
+        print(f"Generation job {job_id} failed: {str(e)}")
+        jobCollection().update_one({'_id': job_id}, {'$set': {
+            'status': 'failed',
+            'error': str(e),
+            'updated_at': datetime.now()
+        }})
+    finally:
+        with active_lock:
+            active_jobs.discard(job_id)
+
+# True if a queued or running job's worker has stopped sending heartbeats
+def isStale(job):
+    if job.get('status') not in ('queued', 'running'):
+        return False
+    last_seen = job.get('heartbeat_at') or job.get('updated_at')
+    return last_seen is not None and datetime.now() - last_seen > timedelta(seconds=JOB_STALE_SECONDS)
+
+# Get a job by ID, returns None if it doesn't exist. A job whose worker died is marked failed here.
+def getJob(job_id):
+    job = jobCollection().find_one({'_id': job_id})
+    if job and isStale(job):
+        error = "The worker running this job stopped (restart or timeout), please submit it again"
+        # Only if nothing changed since it was read, so a heartbeat that just arrived wins
+        jobCollection().update_one(
+            {'_id': job_id, 'status': job['status'], 'heartbeat_at': job.get('heartbeat_at')},
+            {'$set': {'status': 'failed', 'error': error, 'updated_at': datetime.now()}}
+        )
+        job = jobCollection().find_one({'_id': job_id})
+    if job:
+        job['jobId'] = job.pop('_id')
+    return job
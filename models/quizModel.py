@@ -1,11 +1,105 @@
+import os
+import uuid
+import random
+import threading
 from datetime import datetime
+from cache import LRUCache
+from grading import compileAnswerKey
+import questionindex # near-duplicate question index
+
+# Question IDs and pool settings per quiz, so sampling an attempt doesn't reload the whole pool.
+# Entries are dropped on update/delete here and expire after a short TTL for other workers.
+question_pool_cache = LRUCache(
+    maxsize=int(os.environ.get('QUESTION_POOL_CACHE_SIZE', 1024)),
+    ttl=int(os.environ.get('QUESTION_POOL_CACHE_TTL', 60))
+)
+
+# Compiled answer keys (question id -> correct set) per quiz, so grading never loads the full document
+answer_key_cache = LRUCache(
+    maxsize=int(os.environ.get('ANSWER_KEY_CACHE_SIZE', 1024)),
+    ttl=int(os.environ.get('ANSWER_KEY_CACHE_TTL', 60))
+)
+
+# Serialised quizzes for getQuizJson, {'version', 'body'}, so a class loading the same quiz at once is
+# served from memory without rebuilding the JSON. Writes in this worker drop the entry. With QUIZ_CACHE_VERIFY
+# (the default, the Procfile runs several workers) every hit checks the cached version against MongoDB,
+# so a write or delete through another worker is seen straight away rather than after the TTL.
+quiz_cache = LRUCache(
+    maxsize=int(os.environ.get('QUIZ_CACHE_SIZE', 512)),
+    ttl=int(os.environ.get('QUIZ_CACHE_TTL', 30))
+)
+QUIZ_CACHE_VERIFY = os.environ.get('QUIZ_CACHE_VERIFY', 'true').lower() == 'true'
+
+# Writes seen by this worker. A cache fill is only stored if no write happened while it was being read,
+# so a read that raced a write can't put the old document back after the write dropped it.
+quiz_write_count = 0
+quiz_write_lock = threading.Lock()
+
+# Keep the near-duplicate question index in step with a saved quiz. The index only guides
+# generation, so a failure here is logged rather than failing the save.
+def refreshQuestionIndex(quizID=None, quizzes=None, questionIds=None):
+    try:
+        if quizzes is not None:
+            questionindex.indexQuizzes(quizzes)
+        elif questionIds is not None:
+            questionindex.reindexQuestions(quizID, questionIds)
+        else:
+            questionindex.reindexQuiz(quizID)
+    except Exception as e:
+        print(f"Failed to update question index: {str(e)}")
+
+# Drop everything cached for a quiz after it changes
+def invalidateQuizCaches(quizID):
+    global quiz_write_count
+    with quiz_write_lock:
+        quiz_write_count += 1
+    quiz_cache.delete(quizID)
+    question_pool_cache.delete(quizID)
+    answer_key_cache.delete(quizID)
+
+# Hit/miss counters of the quiz caches
+def cacheStats():
+    return {
+        'quiz': quiz_cache.stats(),
+        'questionPool': question_pool_cache.stats(),
+        'answerKey': answer_key_cache.stats()
+    }
+
+# Fields a student never sees while taking a quiz
+ANSWER_FIELDS = ('correctAnswer', 'explanation')
+
+REQUIRED_FIELDS = ('question', 'options', 'correctAnswer')
+
+# Check questions before they are normalised, raises ValueError naming the first bad one
+def checkQuestions(questions):
+    if not isinstance(questions, list):
+        raise ValueError("questions must be a list")
+    for index, question in enumerate(questions):
+        if not isinstance(question, dict):
+            raise ValueError(f"Question {index + 1} must be an object")
+        missing = [field for field in REQUIRED_FIELDS if field not in question]
+        if missing:
+            raise ValueError(f"Question {index + 1} is missing {', '.join(missing)}")
+
+# Normalise one question into the stored shape, giving it an ID if it doesn't have one.
+# This is the only place questions are rebuilt, for single, bulk and updated quizzes alike.
+def normalizeQuestion(question):
+    return {
+        'id': str(question.get('id') or uuid.uuid4()),
+        'question': question['question'],
+        'options': question['options'],
+        'correctAnswer': question['correctAnswer'],
+        'isMultiAnswer': question.get('isMultiAnswer', False),
+        'imageUrl': question.get('imageUrl'),  # Include imageUrl if present
+        'explanation': question.get('explanation'),
+    }
 
 class Quiz: 
     # constructor
     def __init__(self, title, description, questions, category=None, aiModel=None, randomizeQuestions=False, useQuestionPool=False, questionsPerAttempt=None): # Self is a reference to current instance, title and questions are parameters
         self.title = title
         self.description = description
-        self.questions = questions
+        self.questions = [normalizeQuestion(question) for question in questions]
         self.category = category
         self.aiModel = aiModel
         self.created_at = datetime.now()
@@ -17,47 +111,30 @@ class Quiz:
         return {
             'title': self.title,
             'description': self.description,
-            'questions': [
-                {
-                    'id': question['id'],
-                    'question': question['question'],
-                    'options': question['options'],
-                    'correctAnswer': question['correctAnswer'],
-                    'isMultiAnswer': question.get('isMultiAnswer', False),
-                    'imageUrl': question.get('imageUrl'),
-                    'explanation': question.get('explanation'),
-                } for question in self.questions
-            ],
+            'questions': self.questions,
             'category': self.category,
             'aiModel': self.aiModel,
             'randomizeQuestions': self.randomizeQuestions,
             'useQuestionPool': self.useQuestionPool,
             'questionsPerAttempt': self.questionsPerAttempt,
-            'created_at': self.created_at
-        }
-# create a new quiz using the quizData
-def createQuiz(quizData):
-    from db import quizdb
-
-    # Validate and process questions with images
-    processed_questions = []
-    for question in quizData['questions']:
-        processed_question = {
-            'id': question['id'],
-            'question': question['question'],
-            'options': question['options'],
-            'correctAnswer': question['correctAnswer'],
-            'imageUrl': question.get('imageUrl'),  # Include imageUrl if present
-            'isMultiAnswer': question.get('isMultiAnswer', False),
-            'explanation': question.get('explanation')
+            'created_at': self.created_at,
+            'version': 1 # bumped on every write, used for ETags and optimistic concurrency
         }
-        processed_questions.append(processed_question)
 
+# Validate quizData and build the document to store, raises ValueError if it is invalid
+def buildQuizDocument(quizData):
+    if not isinstance(quizData, dict):
+        raise ValueError("Quiz must be an object")
+    if not quizData.get('title') or not quizData.get('questions'):
+        raise ValueError("Title and questions are required")
+    if not quizData.get('userId'):
+        raise ValueError("userId is required")
+    checkQuestions(quizData['questions'])
 
     quiz = Quiz(
         title=quizData['title'], 
-        description=quizData['description'],
-        questions=processed_questions,
+        description=quizData.get('description', ''),
+        questions=quizData['questions'],
         category=quizData.get('category'),
         aiModel=quizData.get('aiModel'),
         randomizeQuestions=quizData.get('randomizeQuestions', False), # Default to False if not provided
@@ -66,75 +143,433 @@ def createQuiz(quizData):
     )
     quiz_dict = quiz.to_dict()
     quiz_dict['userId'] = quizData['userId']  # Add userId to the quiz data
+    return quiz_dict
+
+# create a new quiz using the quizData
+def createQuiz(quizData):
+    from db import quizdb
+
+    quiz_dict = buildQuizDocument(quizData)
     result = quizdb.quizcollection.insert_one(quiz_dict)
     
-    # convert the ObjectId to string and return the quiz
+    # convert the ObjectId to string and return the quiz as stored
     quizID = str(result.inserted_id)
+    quiz_dict['_id'] = quizID
+    refreshQuestionIndex(quizzes=[quiz_dict])
     return {
         'message': 'QuizID: ' + quizID,
         'quiz_id': quizID,
-        'title': quizData['title'],
-        'description': quizData['description'],
-        'category': quizData.get('category'),
-        'questions': str(processed_question),
-        #'created_at': quizData['created_at']
+        'quiz': quiz_dict
     }
 
-# get a quiz by quizID
+# Create many quizzes at once with unordered insert_many, chunk_size documents per round trip.
+# Returns one result per input in order, {'index', 'quiz_id'} or {'index', 'error'}. A chunk that fails
+# outright (e.g. the connection drops) doesn't lose the results of earlier chunks, its quizzes are
+# looked up to report which were inserted before the failure.
+def createQuizzes(quizDataList, defaultUserId=None, chunk_size=500):
+    from db import quizdb
+    from bson import ObjectId
+    from pymongo.errors import BulkWriteError
+
+    results = [None] * len(quizDataList)
+    pending = [] # (index, document) ready to insert
+    for index, quizData in enumerate(quizDataList):
+        try:
+            if isinstance(quizData, dict) and defaultUserId and not quizData.get('userId'):
+                quizData = {**quizData, 'userId': defaultUserId}
+            quiz_dict = buildQuizDocument(quizData)
+        except (ValueError, KeyError, TypeError) as e:
+            results[index] = {'index': index, 'error': str(e)}
+            continue
+        quiz_dict['_id'] = ObjectId()
+        pending.append((index, quiz_dict))
+
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        failed = {}
+        try:
+            quizdb.quizcollection.insert_many([quiz_dict for _, quiz_dict in chunk], ordered=False)
+        except BulkWriteError as e:
+            failed = {error['index']: error.get('errmsg', 'Insert failed') for error in e.details.get('writeErrors', [])}
+        except Exception as e:
+            print(f"Error inserting quizzes: {e}")
+            try:
+                chunk_ids = [quiz_dict['_id'] for _, quiz_dict in chunk]
+                stored = {quiz['_id'] for quiz in quizdb.quizcollection.find({'_id': {'$in': chunk_ids}}, {'_id': 1})}
+                message = f"Insert failed: {str(e)}"
+            except Exception:
+                stored = set()
+                message = f"Insert failed, the quiz may or may not have been saved: {str(e)}"
+            failed = {position: message for position, (_, quiz_dict) in enumerate(chunk) if quiz_dict['_id'] not in stored}
+        for position, (index, quiz_dict) in enumerate(chunk):
+            if position in failed:
+                results[index] = {'index': index, 'error': failed[position]}
+            else:
+                results[index] = {'index': index, 'quiz_id': str(quiz_dict['_id'])}
+        refreshQuestionIndex(quizzes=[quiz_dict for position, (_, quiz_dict) in enumerate(chunk) if position not in failed])
+    return results
+
+# get a quiz by quizID straight from MongoDB
 def getQuiz(quizID):
     from db import quizdb
     from bson import ObjectId
+
     quiz = quizdb.quizcollection.find_one({'_id': ObjectId(quizID)})
-    if quiz:
-        quiz['_id'] = str(quiz['_id'])  # Convert ObjectId to string
+    if not quiz:
+        return None
+    quiz['_id'] = str(quiz['_id'])  # Convert ObjectId to string
     return quiz
 
-# Get all quizzes
-def getAll(userId=None):
+# Get a quiz serialised by serialize (e.g. the app's JSON encoder), cached per quiz.
+# Returns {'version', 'body'} or None if the quiz doesn't exist.
+def getQuizJson(quizID, serialize):
+    from db import quizdb
+    from bson import ObjectId
+
+    entry = quiz_cache.get(quizID)
+    if entry is not None and QUIZ_CACHE_VERIFY:
+        # Only the version comes back, the cached body is reused if no other worker has changed the quiz
+        current = quizdb.quizcollection.find_one({'_id': ObjectId(quizID)}, {'version': 1})
+        if current is None or current.get('version', 0) != entry['version']:
+            quiz_cache.delete(quizID)
+            entry = None
+    if entry is None:
+        writes_before = quiz_write_count
+        quiz = getQuiz(quizID)
+        if quiz is None:
+            return None
+        entry = {'version': quiz.get('version', 0), 'body': serialize(quiz)}
+        if quiz_write_count == writes_before:
+            quiz_cache.set(quizID, entry)
+    return entry
+
+# Sort options for quiz listings, each ends on _id so the order is stable for cursors
+QUIZ_SORTS = {
+    'newest': [('_id', -1)],
+    'oldest': [('_id', 1)],
+    'title': [('title', 1), ('_id', 1)],
+}
+
+# Build the filter and sort for a quiz listing, shared by every listing route.
+# after is the _id of the last quiz on the previous page. sort None returns no sort (natural order).
+def buildQuizQuery(filters, after=None, sort='newest'):
     from db import quizdb
-    query = {}
-    if userId:
-        query['userId'] = userId
-    quizzes = quizdb.quizcollection.find(query)
+    from bson import ObjectId
+
+    if sort is None:
+        if after:
+            raise ValueError("A cursor needs a sort")
+        return {key: value for key, value in filters.items() if value is not None}, None
+    if sort not in QUIZ_SORTS:
+        raise ValueError(f"Unknown sort: {sort}")
+    query = {key: value for key, value in filters.items() if value is not None}
+
+    if after:
+        after = ObjectId(after)
+        if sort == 'newest':
+            query['_id'] = {'$lt': after}
+        elif sort == 'oldest':
+            query['_id'] = {'$gt': after}
+        else:
+            # Title sort, continue after the last quiz's (title, _id) position
+            last = quizdb.quizcollection.find_one({'_id': after}, {'title': 1})
+            if last is None:
+                raise ValueError("Cursor quiz not found")
+            query['$or'] = [
+                {'title': {'$gt': last.get('title')}},
+                {'title': last.get('title'), '_id': {'$gt': after}}
+            ]
+    return query, QUIZ_SORTS[sort]
+
+# List quizzes matching filters. summary leaves out the questions and returns a questionCount instead.
+# Without a sort, paged listings (limit or after) are newest first and plain listings keep insertion order.
+# Returns (quizzes, next_cursor), next_cursor is None on the last page.
+def listQuizzes(filters, limit=None, after=None, sort=None, summary=False):
+    from db import quizdb
+
+    if sort is None and (limit or after):
+        sort = 'newest'
+    query, sort_spec = buildQuizQuery(filters, after, sort)
+    pipeline = [{'$match': query}]
+    if sort_spec:
+        pipeline.append({'$sort': dict(sort_spec)})
+    return quizPage(quizdb.quizcollection, pipeline, limit, summary)
+
+# Run a listing pipeline, adding the page limit and summary projection.
+# Returns (quizzes, next_cursor), next_cursor is the _id of the last quiz when there is another page.
+def quizPage(collection, pipeline, limit=None, summary=False):
+    pipeline = list(pipeline)
+    if limit:
+        pipeline.append({'$limit': limit + 1}) # one extra to know if there is another page
+    if summary:
+        pipeline.append({'$addFields': {'questionCount': {'$size': {'$ifNull': ['$questions', []]}}}})
+        pipeline.append({'$project': {'questions': 0}})
+
     quiz_list = []
-    for quiz in quizzes:
+    for quiz in collection.aggregate(pipeline):
         quiz['_id'] = str(quiz['_id'])  # Convert ObjectId to string
         quiz_list.append(quiz)
+
+    next_cursor = None
+    if limit and len(quiz_list) > limit:
+        quiz_list = quiz_list[:limit]
+        next_cursor = quiz_list[-1]['_id']
+    return quiz_list, next_cursor
+
+# Full-text search over title, description and question text, answered from the quizcollection
+# text index (indexes.py), which MongoDB keeps up to date on every insert, update and delete.
+# sort is 'relevance' (text score, title matches weigh most) or one of QUIZ_SORTS, filters narrow
+# the matches as in listQuizzes and after is the _id of the last quiz on the previous page.
+# Each quiz carries its 'score'. Returns (quizzes, next_cursor).
+def searchQuizzes(text, filters, limit=None, after=None, sort='relevance', summary=True):
+    from db import quizdb
+    from bson import ObjectId
+
+    text = str(text or '').strip()
+    if not text:
+        raise ValueError("Search text is required")
+    score = {'$meta': 'textScore'}
+
+    if sort != 'relevance':
+        query, sort_spec = buildQuizQuery(filters, after, sort)
+        query['$text'] = {'$search': text}
+        pipeline = [{'$match': query}, {'$addFields': {'score': score}}, {'$sort': dict(sort_spec)}]
+        return quizPage(quizdb.quizcollection, pipeline, limit, summary)
+
+    query, _ = buildQuizQuery(filters)
+    query['$text'] = {'$search': text}
+    pipeline = [{'$match': query}, {'$addFields': {'score': score}}]
+    if after:
+        # Continue after the last quiz's (score, _id) position, its score is recomputed for this search
+        after = ObjectId(after)
+        last = next(quizdb.quizcollection.aggregate([{'$match': dict(query, _id=after)}, {'$project': {'score': score}}]), None)
+        if last is None:
+            raise ValueError("Cursor quiz not found")
+        pipeline.append({'$match': {'$or': [
+            {'score': {'$lt': last['score']}},
+            {'score': last['score'], '_id': {'$lt': after}}
+        ]}})
+    pipeline.append({'$sort': {'score': -1, '_id': -1}})
+    return quizPage(quizdb.quizcollection, pipeline, limit, summary)
+
+# Iterate over every quiz matching filters straight from the cursor, batch_size documents per round trip.
+# Nothing is collected into a list, so memory stays flat however many quizzes match.
+def iterQuizzes(filters, batch_size=100, sort='oldest', summary=False):
+    from db import quizdb
+
+    query, sort_spec = buildQuizQuery(filters, sort=sort)
+    pipeline = [{'$match': query}, {'$sort': dict(sort_spec)}]
+    if summary:
+        pipeline.append({'$addFields': {'questionCount': {'$size': {'$ifNull': ['$questions', []]}}}})
+        pipeline.append({'$project': {'questions': 0}})
+
+    for quiz in quizdb.quizcollection.aggregate(pipeline, batchSize=batch_size):
+        quiz['_id'] = str(quiz['_id'])  # Convert ObjectId to string
+        yield quiz
+
+# Get all quizzes
+def getAll(userId=None):
+    quiz_list, _ = listQuizzes({'userId': userId or None})
     return quiz_list
 
-# update a quiz by quizID
-def updateQuiz(quizID, quizData):
+# Get the question IDs and pool settings of a quiz, cached per quiz
+def getQuestionPool(quizID):
+    from db import quizdb
+    from bson import ObjectId
+
+    pool = question_pool_cache.get(quizID)
+    if pool is None:
+        quiz = quizdb.quizcollection.find_one({'_id': ObjectId(quizID)}, {
+            'questions.id': 1, 'randomizeQuestions': 1, 'useQuestionPool': 1, 'questionsPerAttempt': 1
+        })
+        if not quiz:
+            return None
+        pool = {
+            'ids': [question.get('id') for question in quiz.get('questions', [])],
+            'randomizeQuestions': quiz.get('randomizeQuestions', False),
+            'useQuestionPool': quiz.get('useQuestionPool', False),
+            'questionsPerAttempt': quiz.get('questionsPerAttempt')
+        }
+        question_pool_cache.set(quizID, pool)
+    return pool
+
+# IDs of the questions an attempt with this seed is given, in the order they are shown
+def pickQuestionIds(pool, seed, count=None):
+    rng = random.Random(seed)
+    ids = pool['ids']
+
+    if count is None and pool['useQuestionPool']:
+        count = pool['questionsPerAttempt']
+    count = min(count or len(ids), len(ids))
+
+    if count < len(ids):
+        picked = rng.sample(range(len(ids)), count)
+        if not pool['randomizeQuestions']:
+            picked.sort() # keep the quiz's own order for the drawn questions
+    else:
+        picked = list(range(len(ids)))
+        if pool['randomizeQuestions']:
+            rng.shuffle(picked)
+    return [ids[index] for index in picked]
+
+# IDs of the questions the attempt with this seed was given, for grading. None if the quiz doesn't exist.
+def getAttemptQuestionIds(quizID, seed, count=None):
+    pool = getQuestionPool(quizID)
+    if pool is None:
+        return None
+    return pickQuestionIds(pool, seed, count)
+
+# Pick the questions for one attempt using the quiz's pool settings and a seeded RNG, so the same
+# seed always gives the same attempt. Only the picked questions are loaded and answers are left out.
+def getAttempt(quizID, seed=None, count=None):
     from db import quizdb
     from bson import ObjectId
 
+    pool = getQuestionPool(quizID)
+    if pool is None:
+        return None
+
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    picked_ids = pickQuestionIds(pool, seed, count)
+
+    quiz = next(quizdb.quizcollection.aggregate([
+        {'$match': {'_id': ObjectId(quizID)}},
+        {'$project': {
+            'title': 1, 'description': 1, 'category': 1,
+            'questions': {'$filter': {'input': '$questions', 'as': 'q', 'cond': {'$in': ['$$q.id', picked_ids]}}}
+        }},
+        {'$project': {f'questions.{field}': 0 for field in ANSWER_FIELDS}}
+    ]), None)
+    if quiz is None:
+        return None
+
+    by_id = {question.get('id'): question for question in quiz.get('questions', [])}
+    quiz['questions'] = [by_id[question_id] for question_id in picked_ids if question_id in by_id]
+    quiz['_id'] = str(quiz['_id'])
+    quiz['seed'] = seed
+    return quiz
+
+# Get the compiled answer key of a quiz, cached per quiz. Returns None if the quiz doesn't exist.
+def getAnswerKey(quizID):
+    from db import quizdb
+    from bson import ObjectId
+
+    key = answer_key_cache.get(quizID)
+    if key is None:
+        quiz = quizdb.quizcollection.find_one({'_id': ObjectId(quizID)}, {
+            'questions.id': 1, 'questions.correctAnswer': 1, 'questions.isMultiAnswer': 1
+        })
+        if not quiz:
+            return None
+        key = compileAnswerKey(quiz.get('questions', []))
+        answer_key_cache.set(quizID, key)
+    return key
+
+# Fields of a question that can be edited on their own
+EDITABLE_QUESTION_FIELDS = ('question', 'options', 'correctAnswer', 'isMultiAnswer', 'imageUrl', 'explanation')
+
+# Match a question by ID, older generated quizzes stored numeric IDs
+def questionIdFilter(questionId):
+    questionId = str(questionId)
+    if questionId.isdigit():
+        return {'$in': [questionId, int(questionId)]}
+    return questionId
+
+# Filter for a quiz at a given version, quizzes saved before versioning count as version 0
+def versionFilter(version):
+    return {'$in': [0, None]} if version == 0 else version
+
+# Apply an update to a quiz in one round trip, bumping its version. extraFilter narrows the match
+# (e.g. to a question) and expectedVersion makes the write conditional on the version the client saw.
+# reindex refreshes the near-duplicate question index: True rebuilds the quiz's entries, for writes that change
+# userId, category or the whole question list, a list of question IDs rewrites only those questions' entries.
+# Returns {'matched', 'version'} and, when nothing matched, whether the quiz exists and if it was a version conflict.
+def writeQuiz(quizID, update, extraFilter=None, expectedVersion=None, reindex=False):
+    from db import quizdb
+    from bson import ObjectId
+    from pymongo import ReturnDocument
+
+    query = {'_id': ObjectId(quizID), **(extraFilter or {})}
+    if expectedVersion is not None:
+        query['version'] = versionFilter(expectedVersion)
+    update = {**update, '$inc': {'version': 1}}
+
+    quiz = quizdb.quizcollection.find_one_and_update(query, update, projection={'version': 1}, return_document=ReturnDocument.AFTER)
+    if quiz:
+        invalidateQuizCaches(quizID)
+        if reindex is True:
+            refreshQuestionIndex(quizID)
+        elif reindex:
+            refreshQuestionIndex(quizID, questionIds=reindex)
+        return {'matched': True, 'exists': True, 'conflict': False, 'version': quiz['version']}
+
+    # Nothing matched, only now look up why
+    current = quizdb.quizcollection.find_one({'_id': ObjectId(quizID)}, {'version': 1})
+    if current is None:
+        return {'matched': False, 'exists': False, 'conflict': False, 'version': None}
+    version = current.get('version', 0)
+    return {
+        'matched': False,
+        'exists': True,
+        'conflict': expectedVersion is not None and version != expectedVersion,
+        'version': version
+    }
+
+# update a quiz by quizID in a single round trip, 'matched' says whether the quiz exists
+def updateQuiz(quizID, quizData, expectedVersion=None):
+    quizData = {key: value for key, value in quizData.items() if key not in ('_id', 'version')} # managed fields
+
     # Process questions to ensure image URLs are preserved
     if 'questions' in quizData:
-        processed_questions = []
-        for question in quizData['questions']:
-            processed_question = {
-                'id': question['id'],
-                'question': question['question'],
-                'options': question['options'],
-                'correctAnswer': question['correctAnswer'],
-                'isMultiAnswer': question.get('isMultiAnswer', False),
-                'imageUrl': question.get('imageUrl'),
-                'explanation': question.get('explanation')
-            }
-            processed_questions.append(processed_question)
-        quizData['questions'] = processed_questions
+        checkQuestions(quizData['questions'])
+        quizData['questions'] = [normalizeQuestion(question) for question in quizData['questions']]
 
-    quiz = quizdb.quizcollection.find_one({'_id': ObjectId(quizID)})
-    if quiz:
-        quizdb.quizcollection.update_one({'_id': ObjectId(quizID)}, {'$set': quizData})
-        return {'message': 'Quiz updated successfully'}
-    return {'message': 'Error: Quiz not found'}
+    reindex = any(field in quizData for field in ('questions', 'userId', 'category'))
+    result = writeQuiz(quizID, {'$set': quizData}, expectedVersion=expectedVersion, reindex=reindex)
+    result['message'] = 'Quiz updated successfully' if result['matched'] else 'Error: Quiz not found'
+    return result
+
+# Edit fields of one question in place with a positional $set, the rest of the questions aren't sent.
+# 'matched' is False if the quiz or question doesn't exist.
+def updateQuestion(quizID, questionId, fields, expectedVersion=None):
+    updates = {f'questions.$.{field}': value for field, value in fields.items() if field in EDITABLE_QUESTION_FIELDS}
+    if not updates:
+        raise ValueError(f"Nothing to update, editable fields are {', '.join(EDITABLE_QUESTION_FIELDS)}")
 
-# delete a quiz by quizID
+    return writeQuiz(quizID, {'$set': updates}, {'questions.id': questionIdFilter(questionId)}, expectedVersion,
+                     reindex=[questionId] if 'question' in fields else False)
+
+# Append questions to a quiz with $push. 'questions' holds the questions as stored.
+def addQuestions(quizID, questions, expectedVersion=None):
+    checkQuestions(questions)
+    questions = [normalizeQuestion(question) for question in questions]
+    result = writeQuiz(quizID, {'$push': {'questions': {'$each': questions}}}, expectedVersion=expectedVersion,
+                       reindex=[question['id'] for question in questions])
+    result['questions'] = questions
+    return result
+
+# Remove one question with $pull, 'matched' is False if the quiz or question doesn't exist
+def removeQuestion(quizID, questionId, expectedVersion=None):
+    question_filter = questionIdFilter(questionId)
+    return writeQuiz(
+        quizID,
+        {'$pull': {'questions': {'id': question_filter}}},
+        {'questions.id': question_filter},
+        expectedVersion,
+        reindex=[questionId]
+    )
+
+# delete a quiz by quizID in a single round trip, 'matched' says whether the quiz existed
 def deleteQuiz(quizID):
     from db import quizdb
     from bson import ObjectId
-    quiz = quizdb.quizcollection.find_one({'_id': ObjectId(quizID)})
-    if quiz:
-        quizdb.quizcollection.delete_one({'_id': ObjectId(quizID)})
-        return {'message': 'Quiz deleted successfully'}
-    return {'message': 'Error: Quiz not found'}
\ No newline at end of file
+    result = quizdb.quizcollection.delete_one({'_id': ObjectId(quizID)})
+    if result.deleted_count:
+        invalidateQuizCaches(quizID)
+        try:
+            questionindex.removeQuiz(quizID)
+        except Exception as e:
+            print(f"Failed to update question index: {str(e)}")
+        return {'message': 'Quiz deleted successfully', 'matched': True}
+    return {'message': 'Error: Quiz not found', 'matched': False}
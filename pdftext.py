@@ -0,0 +1,285 @@
+import io
+import os
+import re
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+import pymongo
+from datetime import datetime
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor # background extraction, parallel parsing
+from concurrent.futures.process import BrokenProcessPool
+import db # import db
+
+# PyPDF2 is imported where it's used so the app can boot without loading it
+
+# Extracted text is stored one document per page, keyed by the SHA-256 of the PDF bytes,
+# so any upload of the same content shares it and page ranges only read the pages they need
+def pageCollection():
+    return db.quizdb.pdfpages
+
+def textCollection():
+    return db.quizdb.pdftext # one summary document per extracted content hash
+
+# Single background worker so uploads return straight away while extraction runs
+extraction_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-extract')
+
+# Processes used to parse large PDFs that aren't already cached. One pool is shared by every call and
+# its processes are started with 'spawn', so they never inherit the gunicorn worker's threads or MongoClient.
+# Every gunicorn worker has its own pool, so the default is small and the pool is shut down once it has been
+# idle for PDF_EXTRACTION_IDLE_SECONDS rather than holding its processes' memory for the worker's lifetime.
+EXTRACTION_PROCESSES = int(os.environ.get('PDF_EXTRACTION_PROCESSES', min(2, os.cpu_count() or 1)))
+EXTRACTION_IDLE_SECONDS = float(os.environ.get('PDF_EXTRACTION_IDLE_SECONDS', 60))
+PARALLEL_MIN_PAGES = 20 # smaller PDFs are parsed in-process, handing them to the pool costs more than it saves
+extraction_pool = None
+extraction_pool_users = 0 # calls currently using the pool, it is only shut down when this is 0
+extraction_idle_timer = None
+extraction_pool_lock = threading.Lock()
+
+# Matches URLs served by our own /pdfs/<file_id> route
+GRIDFS_PDF_URL = re.compile(r'/pdfs/([0-9a-fA-F]{24})/?$')
+
+def contentHash(content):
+    return hashlib.sha256(content).hexdigest()
+
+# Return the GridFS file ID if the URL points at our own /pdfs route, otherwise None
+def gridfsIdFromUrl(pdf_url):
+    match = GRIDFS_PDF_URL.search(pdf_url.split('?', 1)[0])
+    if not match:
+        return None
+    file_id = ObjectId(match.group(1))
+    if not db.quizdb.fs.files.find_one({'_id': file_id}, {'_id': 1}):
+        return None
+    return file_id
+
+# Extract the text of every page in the PDF
+def extractPages(content):
+    import PyPDF2
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
+    return [page.extract_text() or "" for page in pdf_reader.pages]
+
+# Extract pages [start, end) of the PDF at path, runs inside a worker process
+def extractPageRange(path, start, end):
+    import PyPDF2
+    with open(path, 'rb') as pdf_file:
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        return [pdf_reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+# The shared extraction pool, created on first use. Every call must be paired with releaseExtractionPool.
+def extractionPool():
+    global extraction_pool, extraction_pool_users
+    with extraction_pool_lock:
+        if extraction_idle_timer is not None:
+            extraction_idle_timer.cancel()
+        if extraction_pool is None:
+            extraction_pool = ProcessPoolExecutor(max_workers=EXTRACTION_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+        extraction_pool_users += 1
+        return extraction_pool
+
+# Done with the pool, schedules its shutdown once nothing has used it for EXTRACTION_IDLE_SECONDS
+def releaseExtractionPool():
+    global extraction_pool_users, extraction_idle_timer
+    with extraction_pool_lock:
+        extraction_pool_users -= 1
+        if extraction_pool is not None and extraction_pool_users == 0:
+            extraction_idle_timer = threading.Timer(EXTRACTION_IDLE_SECONDS, shutdownIdlePool, args=(extraction_pool,))
+            extraction_idle_timer.daemon = True
+            extraction_idle_timer.start()
+
+def shutdownIdlePool(pool):
+    global extraction_pool
+    with extraction_pool_lock:
+        if extraction_pool is not pool or extraction_pool_users:
+            return # used again since the timer was set
+        extraction_pool = None
+    pool.shutdown(wait=False)
+
+# Drop a pool whose process died so the next call starts a new one
+def resetExtractionPool(pool):
+    global extraction_pool
+    with extraction_pool_lock:
+        if extraction_pool is pool:
+            extraction_pool = None
+    pool.shutdown(wait=False)
+
+# Extract every page using the process pool, one contiguous page range per task.
+# The workers read the PDF from a temporary file instead of each being sent the bytes.
+def extractPagesParallel(content, workers=EXTRACTION_PROCESSES):
+    import PyPDF2
+    total_pages = len(PyPDF2.PdfReader(io.BytesIO(content)).pages)
+    workers = max(1, min(workers, total_pages))
+    if workers == 1 or total_pages < PARALLEL_MIN_PAGES:
+        return extractPages(content)
+
+    chunk = (total_pages + workers - 1) // workers
+    ranges = [(start, min(start + chunk, total_pages)) for start in range(0, total_pages, chunk)]
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as pdf_file:
+        pdf_file.write(content)
+    pool = extractionPool()
+    try:
+        futures = [pool.submit(extractPageRange, pdf_file.name, start, end) for start, end in ranges]
+        pages = []
+        for future in futures: # results are joined in page order
+            pages.extend(future.result())
+        return pages
+    except BrokenProcessPool:
+        print("PDF extraction pool failed, extracting in-process")
+        resetExtractionPool(pool)
+        return extractPages(content)
+    finally:
+        releaseExtractionPool()
+        os.remove(pdf_file.name)
+
+# Store extracted pages for a content hash, safe to call more than once
+def storePages(content_hash, pages):
+    if textCollection().find_one({'_id': content_hash}, {'_id': 1}):
+        return
+    if pages:
+        try:
+            pageCollection().insert_many([
+                {'contentHash': content_hash, 'page': index, 'text': text}
+                for index, text in enumerate(pages)
+            ], ordered=False)
+        except BulkWriteError:
+            pass # another worker stored the same pages first
+    textCollection().update_one(
+        {'_id': content_hash},
+        {'$setOnInsert': {'pageCount': len(pages), 'extracted_at': datetime.now()}},
+        upsert=True
+    )
+
+# Make sure the GridFS file has a content hash and its page text is stored, returns the hash
+def ensurePageText(file_id):
+    file_doc = db.quizdb.fs.files.find_one({'_id': file_id}, {'contentHash': 1})
+    if file_doc is None:
+        raise ValueError(f"PDF {file_id} not found")
+
+    content_hash = file_doc.get('contentHash')
+    if content_hash and textCollection().find_one({'_id': content_hash}, {'_id': 1}):
+        return content_hash
+
+    # First use of this file (or an upload from before text caching), read and parse it once
+    content = db.fs.get(file_id).read()
+    content_hash = contentHash(content)
+    storePages(content_hash, extractPagesParallel(content))
+    db.quizdb.fs.files.update_one({'_id': file_id}, {'$set': {'contentHash': content_hash}})
+    return content_hash
+
+# Bytes read at a time while hashing an upload, the GridFS chunk size
+UPLOAD_READ_SIZE = 255 * 1024
+
+# Files uploaded before reference counting have no refCount and count as one reference
+def refCountUpdate(delta):
+    return [{'$set': {'refCount': {'$add': [{'$ifNull': ['$refCount', 1]}, delta]}}}]
+
+# Hash a file-like object chunk by chunk, leaving it at the start again
+def hashStream(stream):
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(UPLOAD_READ_SIZE), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+# Store an uploaded PDF, or take another reference on the copy we already have of the same content.
+# The stream is hashed and copied into GridFS chunk by chunk, so the upload is never held in memory.
+# Returns (file_id, created).
+def storePdf(stream, filename, content_type):
+    content_hash = hashStream(stream)
+    files = db.quizdb.fs.files
+
+    existing = files.find_one_and_update(
+        {'contentHash': content_hash},
+        refCountUpdate(1),
+        projection={'_id': 1},
+        sort=[('_id', pymongo.ASCENDING)]
+    )
+    if existing:
+        return existing['_id'], False
+
+    file_id = db.fs.put(stream, filename=filename, content_type=content_type, contentHash=content_hash, refCount=1)
+
+    # Another worker may have stored the same content meanwhile, the oldest copy is kept
+    first = files.find_one({'contentHash': content_hash}, {'_id': 1}, sort=[('_id', pymongo.ASCENDING)])
+    if first['_id'] != file_id:
+        db.fs.delete(file_id)
+        files.update_one({'_id': first['_id']}, refCountUpdate(1))
+        return first['_id'], False
+    return file_id, True
+
+# Drop one reference to a PDF stored by storePdf, deleting the file when none are left and the derived
+# page text and concepts when no other copy of the content remains. Other GridFS files (images, PDFs
+# uploaded before reference counting) are never touched.
+# Returns the references left, or None if there is no such PDF.
+def releasePdf(file_id):
+    files = db.quizdb.fs.files
+    file_doc = files.find_one_and_update(
+        {'_id': file_id, 'refCount': {'$gt': 0}, 'contentHash': {'$exists': True}},
+        {'$inc': {'refCount': -1}},
+        projection={'refCount': 1, 'contentHash': 1},
+        return_document=pymongo.ReturnDocument.AFTER
+    )
+    if file_doc is None:
+        return None
+    if file_doc['refCount'] > 0:
+        return file_doc['refCount']
+
+    # Only delete if no upload took a new reference since the decrement, storePdf may have just found this copy
+    if not files.delete_one({'_id': file_id, 'refCount': 0}).deleted_count:
+        current = files.find_one({'_id': file_id}, {'refCount': 1})
+        return current['refCount'] if current else 0
+    db.quizdb.fs.chunks.delete_many({'files_id': file_id})
+    content_hash = file_doc.get('contentHash')
+    if content_hash and not files.find_one({'contentHash': content_hash}, {'_id': 1}):
+        pageCollection().delete_many({'contentHash': content_hash})
+        textCollection().delete_one({'_id': content_hash})
+        conceptCollection().delete_many({'contentHash': content_hash})
+    return 0
+
+# Concepts extracted from a run of pages, shared by every upload of the same content
+def conceptCollection():
+    return db.quizdb.pdfconcepts
+
+# Get the cached concepts for pages [start, end) of some content, None if they haven't been extracted
+def getConcepts(content_hash, start, end, count, difficulty):
+    doc = conceptCollection().find_one({
+        'contentHash': content_hash, 'start': start, 'end': end, 'count': count, 'difficulty': difficulty
+    })
+    return doc['concepts'] if doc else None
+
+def storeConcepts(content_hash, start, end, count, difficulty, concepts):
+    conceptCollection().update_one(
+        {'contentHash': content_hash, 'start': start, 'end': end, 'count': count, 'difficulty': difficulty},
+        {'$set': {'concepts': concepts, 'extracted_at': datetime.now()}},
+        upsert=True
+    )
+
+# Queue extraction for a freshly uploaded file so the first generation finds it ready
+def warmPageText(file_id):
+    def run():
+        try:
+            ensurePageText(file_id)
+        except Exception as e:
+            print(f"Error extracting PDF {file_id}: {str(e)}")
+    extraction_executor.submit(run)
+
+# Get cached page text for a GridFS PDF, start/end are 0-based and end is exclusive
+def getPages(file_id, start=None, end=None):
+    content_hash = ensurePageText(file_id)
+    query = {'contentHash': content_hash}
+    page_filter = {}
+    if start is not None:
+        page_filter['$gte'] = start
+    if end is not None:
+        page_filter['$lt'] = end
+    if page_filter:
+        query['page'] = page_filter
+    pages = pageCollection().find(query, {'_id': 0, 'text': 1}).sort('page', pymongo.ASCENDING)
+    return [page['text'] for page in pages]
+
+# Number of pages in a GridFS PDF
+def getPageCount(file_id):
+    content_hash = ensurePageText(file_id)
+    return textCollection().find_one({'_id': content_hash})['pageCount']
@@ -0,0 +1,225 @@
+import os
+import time
+import random
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+
+# LLM provider clients are created on first use rather than at import, so booting a worker
+# doesn't pay for importing and configuring SDKs a request may never touch.
+# Every completion goes through complete(): one pooled HTTP client per provider, per-provider
+# timeouts, retries with backoff and a concurrency limit, and optional hedging across providers.
+
+load_dotenv()
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
+GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY')
+
+# Point a provider somewhere else, e.g. benchmarks/fake_provider.py, unset uses the provider's API
+OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL')
+ANTHROPIC_BASE_URL = os.environ.get('ANTHROPIC_BASE_URL')
+GEMINI_API_ENDPOINT = os.environ.get('GEMINI_API_ENDPOINT')
+
+PROVIDERS = ('gpt', 'claude', 'gemini')
+
+# PROVIDER_<NAME>_<PROVIDER> overrides PROVIDER_<NAME> for one provider, e.g. PROVIDER_TIMEOUT_CLAUDE=120
+def providerSetting(provider, name, default):
+    return float(os.environ.get(f'PROVIDER_{name}_{provider.upper()}', os.environ.get(f'PROVIDER_{name}', default)))
+
+PROVIDER_TIMEOUTS = {provider: providerSetting(provider, 'TIMEOUT', 90) for provider in PROVIDERS} # seconds per attempt
+PROVIDER_RETRIES = {provider: int(providerSetting(provider, 'RETRIES', 2)) for provider in PROVIDERS}
+PROVIDER_CONCURRENCY = {provider: int(providerSetting(provider, 'CONCURRENCY', 8)) for provider in PROVIDERS}
+RETRY_BACKOFF = float(os.environ.get('PROVIDER_RETRY_BACKOFF', 1.0))
+HEDGE_AFTER = float(os.environ.get('PROVIDER_HEDGE_AFTER', 20)) # seconds before a hedged call tries the next provider
+
+# Status codes and error types worth another attempt, matched by name so the SDKs needn't be imported
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERRORS = {
+    'APITimeoutError', 'APIConnectionError', 'RateLimitError', 'InternalServerError', 'TimeoutError',
+    'ConnectError', 'ReadTimeout', 'DeadlineExceeded', 'ServiceUnavailable', 'ResourceExhausted', 'TooManyRequests'
+}
+
+_clients = {}
+_lock = threading.Lock()
+
+# Calls in flight per provider, waiting callers queue here rather than at the provider's rate limiter
+provider_slots = {provider: threading.BoundedSemaphore(PROVIDER_CONCURRENCY[provider]) for provider in PROVIDERS}
+
+# Runs the attempts of hedged calls, and Gemini calls so they can be given a deadline
+hedge_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('PROVIDER_HEDGE_WORKERS', 8)), thread_name_prefix='provider-hedge')
+gemini_executor = ThreadPoolExecutor(max_workers=PROVIDER_CONCURRENCY['gemini'], thread_name_prefix='provider-gemini')
+
+# Shared HTTP connection pool for a provider's SDK client, sized to its concurrency limit
+def httpClient(provider):
+    import httpx
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=PROVIDER_CONCURRENCY[provider], max_keepalive_connections=PROVIDER_CONCURRENCY[provider]),
+        timeout=httpx.Timeout(PROVIDER_TIMEOUTS[provider], connect=10)
+    )
+
+# Get the GPT client
+def openaiClient():
+    if 'openai' not in _clients:
+        with _lock:
+            if 'openai' not in _clients:
+                from openai import OpenAI # import OpenAI class
+                _clients['openai'] = OpenAI(
+                    api_key=OPENAI_API_KEY,
+                    base_url=OPENAI_BASE_URL,
+                    timeout=PROVIDER_TIMEOUTS['gpt'],
+                    max_retries=0, # retried in complete()
+                    http_client=httpClient('gpt')
+                )
+    return _clients['openai']
+
+# Get the Claude client
+def claudeClient():
+    if 'claude' not in _clients:
+        with _lock:
+            if 'claude' not in _clients:
+                from anthropic import Anthropic
+                _clients['claude'] = Anthropic(
+                    api_key=ANTHROPIC_API_KEY,
+                    base_url=ANTHROPIC_BASE_URL,
+                    timeout=PROVIDER_TIMEOUTS['claude'],
+                    max_retries=0, # retried in complete()
+                    http_client=httpClient('claude')
+                )
+    return _clients['claude']
+
+# Get a Gemini model, configuring the Gemini API the first time
+def geminiModel(model_name):
+    if 'gemini' not in _clients:
+        with _lock:
+            if 'gemini' not in _clients:
+                import google.generativeai as genai
+                if GOOGLE_API_KEY:
+                    options = {'client_options': {'api_endpoint': GEMINI_API_ENDPOINT}, 'transport': 'rest'} if GEMINI_API_ENDPOINT else {}
+                    genai.configure(api_key=GOOGLE_API_KEY, **options)
+                else:
+                    print("Warning: GOOGLE_API_KEY not found in environment variables")
+                _clients['gemini'] = genai
+    return _clients['gemini'].GenerativeModel(model_name)
+
+# One completion from GPT, messages are [{'role', 'content'}]
+def completeGpt(messages, model, max_tokens=None, temperature=None):
+    options = {key: value for key, value in (('max_tokens', max_tokens), ('temperature', temperature)) if value is not None}
+    completion = openaiClient().chat.completions.create(messages=messages, model=model, **options)
+    return completion.choices[0].message.content.strip()
+
+# One completion from Claude, system messages go in Claude's top-level system parameter
+def completeClaude(messages, model, max_tokens=None, temperature=None):
+    options = {'temperature': temperature} if temperature is not None else {}
+    system = "\n\n".join(message['content'] for message in messages if message['role'] == 'system')
+    if system:
+        options['system'] = system
+    completion = claudeClient().messages.create(
+        model=model,
+        messages=[message for message in messages if message['role'] != 'system'],
+        max_tokens=max_tokens or 4000,
+        **options
+    )
+
+    # Get the response text from Claude's response structure
+    generated_text = completion.content
+    if isinstance(generated_text, list) and len(generated_text) > 0:
+        generated_text = generated_text[0].text
+    return generated_text
+
+# One completion from Gemini, the messages are joined into a single prompt.
+# The SDK takes no per-call timeout, so the call runs on gemini_executor and is abandoned at the deadline.
+# The call holds its provider slot until it actually finishes, an abandoned call still counts towards
+# PROVIDER_CONCURRENCY, so complete() leaves the slot to this function.
+def completeGemini(messages, model, max_tokens=None, temperature=None):
+    config = {key: value for key, value in (('max_output_tokens', max_tokens), ('temperature', temperature)) if value is not None}
+    prompt = "\n\n".join(message['content'] for message in messages)
+    slot = provider_slots['gemini']
+
+    def call():
+        try:
+            return geminiModel(model).generate_content(prompt, generation_config=config or None).text
+        finally:
+            slot.release()
+
+    slot.acquire()
+    try:
+        future = gemini_executor.submit(call)
+    except Exception:
+        slot.release()
+        raise
+    return future.result(timeout=PROVIDER_TIMEOUTS['gemini'])
+
+COMPLETIONS = {
+    'gpt': completeGpt,
+    'claude': completeClaude,
+    'gemini': completeGemini,
+}
+
+def isRetryable(error):
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    if isinstance(status, int) and status in RETRYABLE_STATUS:
+        return True
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+# Get a completion from a provider and return its text. Transient errors are retried with exponential
+# backoff and jitter, retries=None uses the provider's PROVIDER_RETRIES.
+def complete(provider, messages, model, max_tokens=None, temperature=None, retries=None):
+    if provider not in COMPLETIONS:
+        raise ValueError(f"Unknown provider: {provider}")
+    retries = PROVIDER_RETRIES[provider] if retries is None else retries
+
+    for attempt in range(retries + 1):
+        try:
+            with nullcontext() if provider == 'gemini' else provider_slots[provider]: # completeGemini holds its own slot
+                return COMPLETIONS[provider](messages, model, max_tokens=max_tokens, temperature=temperature)
+        except Exception as e:
+            if attempt >= retries or not isRetryable(e):
+                raise
+            delay = RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"{provider} attempt {attempt + 1} failed ({type(e).__name__}: {str(e)}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+# Run the same request against providers in order of preference, starting the next one whenever the
+# ones in flight haven't answered within hedge_after seconds, or straight away if they failed.
+# calls is [(provider, complete() keyword arguments)], parse turns the text into the result and raises
+# if it isn't usable. Returns (provider, result) for the first usable answer. Calls that lose keep
+# running in the background, their results are dropped.
+def completeHedged(calls, parse=None, hedge_after=HEDGE_AFTER):
+    remaining = list(calls)
+    pending = {}
+    errors = []
+
+    def attempt(provider, request):
+        text = complete(provider, **request)
+        return parse(text) if parse else text
+
+    def launch():
+        provider, request = remaining.pop(0)
+        pending[hedge_executor.submit(attempt, provider, request)] = provider
+
+    while remaining or pending:
+        if not pending and len(remaining) == 1:
+            # Nothing left to hedge against, call in this thread so unhedged generations don't queue for hedge_executor
+            provider, request = remaining.pop(0)
+            try:
+                return provider, attempt(provider, request)
+            except Exception as e:
+                print(f"{provider} failed: {str(e)}")
+                errors.append(e)
+                break
+        if not pending:
+            launch()
+        done, _ = wait(pending, timeout=hedge_after if remaining else None, return_when=FIRST_COMPLETED)
+        if not done:
+            print(f"No answer from {', '.join(pending.values())} after {hedge_after}s, hedging with {remaining[0][0]}")
+            launch()
+            continue
+        for future in done:
+            provider = pending.pop(future)
+            try:
+                return provider, future.result()
+            except Exception as e:
+                print(f"{provider} failed: {str(e)}")
+                errors.append(e)
+    raise errors[-1]
@@ -0,0 +1,121 @@
+import re
+
+# Local structural checks on generated questions, run before anything is sent to the LLM validator.
+# Defects found here don't need a model to spot, and a question that fails them isn't worth
+# paying to validate: it is repaired when that's unambiguous, otherwise regenerated or reported.
+
+OPTION_COUNT = 4
+
+# Words ignored when comparing options and questions, so "The mitochondria" repeats "mitochondria"
+IGNORED_WORDS = {'a', 'an', 'the'}
+
+# Lowercase and collapse whitespace. Symbols are kept: 'C', 'C++' and 'C#', or '1' and '-1', are different options.
+def normalizeOption(text):
+    return ' '.join(str(text).lower().split())
+
+# Also drop punctuation, only used to match a loosely written answer onto an option
+def looseOption(text):
+    return ' '.join(re.sub(r'[^a-z0-9 ]+', ' ', str(text).lower()).split())
+
+# Sentence punctuation dropped from the ends of words when comparing, symbols such as + - # % are kept
+SENTENCE_PUNCTUATION = '.,;:!?"\''
+
+# Comparison key for near-identical text, normalized without articles, sentence punctuation or plural endings.
+# Deliberately strict: "increases by 10%" and "increases by 20%" are different options.
+def comparisonKey(text):
+    words = [word.strip(SENTENCE_PUNCTUATION) for word in normalizeOption(text).split()]
+    return ' '.join(word.rstrip('s') if len(word) > 3 else word for word in words if word and word not in IGNORED_WORDS)
+
+# Map one stated answer onto the option it means: the option itself, the same text up to case and
+# whitespace, the same text up to punctuation if only one option fits, or a letter such as "B" or "B) ...".
+# Returns None if nothing matches.
+def matchOption(answer, options):
+    if answer in options:
+        return answer
+    for normalize in (normalizeOption, looseOption):
+        matches = [option for option in options if normalize(option) == normalize(answer)]
+        if len(matches) == 1:
+            return matches[0]
+    letter = re.match(r'^\s*(?:option\s*)?([a-z])\s*(?:[.):]|$)', str(answer), re.IGNORECASE)
+    if letter:
+        index = ord(letter.group(1).lower()) - ord('a')
+        if 0 <= index < len(options):
+            return options[index]
+    return None
+
+# Repair what can be fixed without a model: stray whitespace in options and a correctAnswer that
+# names an option loosely. Returns a new question, the input is left alone.
+def repairQuestion(question):
+    question = dict(question)
+    options = question.get('options')
+    if not isinstance(options, list):
+        return question
+    options = [option.strip() if isinstance(option, str) else option for option in options]
+    question['options'] = options
+
+    answer = question.get('correctAnswer')
+    if isinstance(answer, list):
+        matched = [matchOption(item, options) for item in answer]
+        if all(item is not None for item in matched):
+            question['correctAnswer'] = matched
+    elif answer is not None:
+        matched = matchOption(answer, options)
+        if matched is not None:
+            question['correctAnswer'] = matched
+    return question
+
+# Structural problems with one question, an empty list if it passes
+def questionIssues(question, option_count=OPTION_COUNT):
+    issues = []
+    if not str(question.get('question') or '').strip():
+        issues.append("Question text is empty")
+
+    options = question.get('options')
+    if not isinstance(options, list):
+        return issues + ["Options are not a list"]
+    if len(options) != option_count:
+        issues.append(f"Has {len(options)} options instead of {option_count}")
+
+    keys = [comparisonKey(option) for option in options]
+    if any(not str(option).strip() for option in options):
+        issues.append("Has an empty option")
+    for index, key in enumerate(keys):
+        repeated = next((other for other in range(index) if key and key == keys[other]), None)
+        if repeated is not None:
+            issues.append(f"Option {index + 1} duplicates option {repeated + 1}")
+
+    answer = question.get('correctAnswer')
+    answers = answer if isinstance(answer, list) else [answer]
+    if not answers or any(item not in options for item in answers):
+        issues.append("correctAnswer is not one of the options")
+
+    if not str(question.get('explanation') or '').strip():
+        issues.append("Explanation is empty")
+    return issues
+
+# Structural problems across a quiz, {index: [issues]} for the questions that fail,
+# including questions that repeat an earlier one
+def quizIssues(questions, option_count=OPTION_COUNT):
+    failing = {}
+    seen = {}
+    for index, question in enumerate(questions):
+        issues = questionIssues(question, option_count)
+        key = comparisonKey(question.get('question') or '')
+        if key in seen:
+            issues.append(f"Repeats question {seen[key] + 1}")
+        elif key:
+            seen[key] = index
+        if issues:
+            failing[index] = issues
+    return failing
+
+# Validation feedback entry for a question that failed the local checks, in the LLM validator's shape
+def localFeedback(issues):
+    return {
+        'score': 0,
+        'difficulty_alignment': None, # not judged, the question was never sent for validation
+        'difficulty_rating': None,
+        'issues': issues,
+        'suggestions': ["Regenerate or edit this question"],
+        'structural': True
+    }
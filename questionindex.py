@@ -0,0 +1,193 @@
+import os
+import re
+import uuid
+import struct
+import hashlib
+from pymongo import ReplaceOne
+import db # import db
+
+# Near-duplicate index of saved questions, MinHash signatures with LSH banding, kept per scope
+# (a user's bank and a category). One document per question per scope in questionindex:
+#   {'_id': 'scope|quizId|questionId|n', 'scope', 'quizId', 'questionId', 'text', 'signature', 'bands', 'run'}
+# Candidates are found through the (scope, bands) index, so a lookup reads only the questions that
+# share a band with the new one however large the bank is, then the signatures confirm the match.
+
+NUM_PERMUTATIONS = 64
+BANDS = 8 # 8 bands of 8 rows, questions sharing ~75% of their shingles are likely to become candidates
+ROWS = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 4 # characters
+DUPLICATE_THRESHOLD = float(os.environ.get('DUPLICATE_QUESTION_THRESHOLD', 0.8)) # estimated Jaccard similarity
+
+# Each shingle is hashed once with SHAKE-128 into NUM_PERMUTATIONS independent 32-bit values, so the
+# signature is a column-wise min computed in C rather than 64 Python hash loops per shingle
+SHINGLE_HASHES = struct.Struct(f'<{NUM_PERMUTATIONS}I')
+
+def indexCollection():
+    return db.quizdb.questionindex
+
+# Lowercase, drop punctuation and collapse whitespace
+def normalizeQuestionText(text):
+    return ' '.join(re.sub(r'[^a-z0-9 ]+', ' ', str(text or '').lower()).split())
+
+# Character shingles of the normalized text
+def shingles(text):
+    text = normalizeQuestionText(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[index:index + SHINGLE_SIZE] for index in range(len(text) - SHINGLE_SIZE + 1)}
+
+# MinHash signature of a question's text, None for empty text
+def signature(text):
+    pieces = shingles(text)
+    if not pieces:
+        return None
+    hashed = [SHINGLE_HASHES.unpack(hashlib.shake_128(piece.encode('utf-8')).digest(SHINGLE_HASHES.size)) for piece in pieces]
+    return list(map(min, zip(*hashed)))
+
+# LSH band keys of a signature, two questions are candidates if any key is equal
+def bandKeys(sig):
+    keys = []
+    for band in range(BANDS):
+        rows = ','.join(str(value) for value in sig[band * ROWS:(band + 1) * ROWS])
+        keys.append(f"{band}:{hashlib.blake2b(rows.encode('utf-8'), digest_size=8).hexdigest()}")
+    return keys
+
+# Estimated Jaccard similarity of two signatures
+def similarity(first, second):
+    return sum(1 for a, b in zip(first, second) if a == b) / NUM_PERMUTATIONS
+
+# Scopes a quiz's questions are indexed under and compared against
+def scopesFor(userId=None, category=None):
+    scopes = []
+    if userId:
+        scopes.append(f"user:{userId}")
+    if category:
+        scopes.append(f"category:{category}")
+    return scopes
+
+# Replace the index entries of a quiz with its current questions. quiz needs _id, userId, category, questions.
+def indexQuiz(quiz):
+    indexQuizzes([quiz])
+
+# Upserts for the index entries of a quiz's questions. Entries are keyed by question ID and occurrence (n),
+# so questions that share an ID are all indexed and one question's entries can be rewritten on their own.
+def _entryWrites(quiz, run):
+    quiz_id = str(quiz['_id'])
+    occurrences = {}
+    writes = []
+    for question in quiz.get('questions') or []:
+        question_id = str(question.get('id'))
+        occurrence = occurrences[question_id] = occurrences.get(question_id, -1) + 1
+        sig = signature(question.get('question'))
+        if sig is None:
+            continue
+        for scope in scopesFor(quiz.get('userId'), quiz.get('category')):
+            document = {
+                '_id': f"{scope}|{quiz_id}|{question_id}|{occurrence}",
+                'scope': scope,
+                'quizId': quiz_id,
+                'questionId': question_id,
+                'text': str(question.get('question'))[:200],
+                'signature': sig,
+                'bands': bandKeys(sig),
+                'run': run
+            }
+            writes.append(ReplaceOne({'_id': document['_id']}, document, upsert=True))
+    return writes
+
+def _bulkWrite(writes):
+    collection = indexCollection()
+    for start in range(0, len(writes), 1000):
+        collection.bulk_write(writes[start:start + 1000], ordered=False)
+
+# Index many quizzes at once, e.g. after a bulk create. Whatever an earlier run left for these quizzes
+# (removed questions) is deleted after the upserts.
+def indexQuizzes(quizzes):
+    run = uuid.uuid4().hex
+    _bulkWrite([write for quiz in quizzes for write in _entryWrites(quiz, run)])
+    indexCollection().delete_many({'quizId': {'$in': [str(quiz['_id']) for quiz in quizzes]}, 'run': {'$ne': run}})
+
+# Rebuild the index entries of a saved quiz from the database
+def reindexQuiz(quizID):
+    from bson import ObjectId
+    quiz = db.quizdb.quizcollection.find_one({'_id': ObjectId(quizID)}, {'userId': 1, 'category': 1, 'questions.id': 1, 'questions.question': 1})
+    if quiz is None:
+        removeQuiz(quizID)
+    else:
+        indexQuiz(quiz)
+
+# Rewrite only the entries of some questions of a saved quiz after they were added, edited or removed,
+# so a single-question edit costs a few writes rather than a reindex of the whole pool
+def reindexQuestions(quizID, questionIds):
+    from bson import ObjectId
+    question_ids = [str(question_id) for question_id in questionIds]
+    stored_ids = question_ids + [int(question_id) for question_id in question_ids if question_id.isdigit()] # older quizzes stored numeric IDs
+    quiz = next(db.quizdb.quizcollection.aggregate([
+        {'$match': {'_id': ObjectId(quizID)}},
+        {'$project': {
+            'userId': 1, 'category': 1,
+            'questions': {'$filter': {'input': '$questions', 'as': 'q', 'cond': {'$in': ['$$q.id', stored_ids]}}}
+        }},
+        {'$project': {'questions.id': 1, 'questions.question': 1, 'userId': 1, 'category': 1}}
+    ]), None)
+
+    run = uuid.uuid4().hex
+    if quiz is not None:
+        _bulkWrite(_entryWrites(quiz, run))
+    indexCollection().delete_many({'quizId': str(quizID), 'questionId': {'$in': question_ids}, 'run': {'$ne': run}})
+
+def removeQuiz(quizID):
+    indexCollection().delete_many({'quizId': str(quizID)})
+
+# Find near-duplicates of each question among the indexed questions in scopes, in one query.
+# Returns a list per question of {'quizId', 'questionId', 'text', 'similarity', 'scopes'}, best match first,
+# scopes being the ones the match was found in.
+def findDuplicates(questions, scopes, threshold=DUPLICATE_THRESHOLD, excludeQuizId=None, signatures=None):
+    signatures = signatures or [signature(question.get('question')) for question in questions]
+    if not scopes or not any(signatures):
+        return [[] for _ in questions]
+
+    all_bands = sorted({key for sig in signatures if sig for key in bandKeys(sig)})
+    query = {'scope': {'$in': scopes}, 'bands': {'$in': all_bands}}
+    if excludeQuizId:
+        query['quizId'] = {'$ne': str(excludeQuizId)}
+    candidates = list(indexCollection().find(query, {'scope': 1, 'quizId': 1, 'questionId': 1, 'text': 1, 'signature': 1, 'bands': 1}))
+
+    matches = []
+    for sig in signatures:
+        found = {}
+        if sig:
+            bands = set(bandKeys(sig))
+            for candidate in candidates:
+                if bands.isdisjoint(candidate['bands']):
+                    continue
+                score = similarity(sig, candidate['signature'])
+                if score < threshold:
+                    continue
+                key = (candidate['quizId'], candidate['questionId'], candidate['text']) # the same question can be indexed under two scopes
+                match = found.setdefault(key, {'quizId': candidate['quizId'], 'questionId': candidate['questionId'],
+                                               'text': candidate['text'], 'similarity': round(score, 3), 'scopes': []})
+                match['scopes'].append(candidate['scope'])
+        matches.append(sorted(found.values(), key=lambda match: -match['similarity']))
+    return matches
+
+# Drop questions that near-duplicate one already in the bank, one in accepted (questions kept earlier,
+# e.g. already streamed) or an earlier one in the list.
+# Returns (kept, dropped), each dropped entry is {'question', 'duplicateOf'}.
+def filterDuplicates(questions, scopes, threshold=DUPLICATE_THRESHOLD, accepted=()):
+    signatures = [signature(question.get('question')) for question in questions]
+    matches = findDuplicates(questions, scopes, threshold, signatures=signatures)
+    kept = list(accepted)
+    kept_signatures = [signature(question.get('question')) for question in kept]
+    dropped = []
+    for question, found, sig in zip(questions, matches, signatures):
+        if found:
+            dropped.append({'question': question, 'duplicateOf': found[0]})
+            continue
+        earlier = next((index for index, other in enumerate(kept_signatures) if sig and other and similarity(sig, other) >= threshold), None)
+        if earlier is not None:
+            dropped.append({'question': question, 'duplicateOf': {'questionId': kept[earlier].get('id'), 'text': kept[earlier].get('question')}})
+            continue
+        kept.append(question)
+        kept_signatures.append(sig)
+    return kept[len(accepted):], dropped
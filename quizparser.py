@@ -0,0 +1,171 @@
+import re
+import ast
+import json
+
+# Parser for LLM quiz output. Accepts JSON or Python dict syntax, strips code fences and
+# repairs the usual defects (smart quotes, trailing commas, comments, truncated output)
+# without ever calling eval. Every parse returns (result, errors) so callers can keep
+# partial results instead of paying for a regeneration.
+
+CODE_FENCE = re.compile(r'```[a-zA-Z]*')
+# Curly quotes are only swapped where they open or close a string, quotes and apostrophes
+# inside string values are kept
+SMART_QUOTES = {'“': '"', '”': '"', '„': '"', '‟': '"', '″': '"', '‘': "'", '’': "'"}
+PYTHON_WORDS = {'true': 'True', 'false': 'False', 'null': 'None', 'none': 'None'}
+
+REQUIRED_QUESTION_FIELDS = ('question', 'options', 'correctAnswer')
+
+# Remove markdown code fences and anything outside the outermost braces
+def extractDictText(text):
+    text = CODE_FENCE.sub('', text or '').strip()
+    start = text.find('{')
+    if start == -1:
+        return None
+    end = text.rfind('}') + 1
+    # If the closing brace never arrived the output was truncated, keep everything for repair
+    return text[start:end] if end > start else text[start:]
+
+# True if a curly quote at text[i] closes its string, i.e. the next non-space character
+# ends the value or the text ends
+def _closesSmartString(text, i):
+    i += 1
+    while i < len(text) and text[i].isspace():
+        i += 1
+    return i == len(text) or text[i] in ',:}]'
+
+# Drop a trailing comma (and whitespace) from the end of the output buffer
+def _stripTrailingComma(out):
+    end = len(out)
+    while end and out[end - 1].isspace():
+        end -= 1
+    if end and out[end - 1] == ',':
+        del out[end - 1:]
+
+# Single pass over the text outside of strings: removes trailing commas and # comments,
+# converts JSON literals to Python, swaps curly string delimiters for straight quotes,
+# escapes raw newlines in strings and, if the output
+# was cut off, rolls back to the last complete value and closes the open brackets.
+# Returns (repaired_text, errors).
+def repairDictText(text):
+    errors = []
+    out = []
+    stack = []
+    quote = None
+    smart = None # the curly quote style that opened the current string, if any
+    escape = False
+    safe_point = None # (length of out, open brackets) after the last complete container
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if quote:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif smart and SMART_QUOTES.get(ch) == smart and _closesSmartString(text, i):
+                ch = quote
+                quote = smart = None
+            elif smart and ch == quote:
+                ch = '\\' + ch
+            elif ch == quote:
+                quote = None
+            elif ch == '\n':
+                ch = '\\n'
+            out.append(ch)
+            i += 1
+            continue
+
+        if ch in '"\'':
+            quote = ch
+            out.append(ch)
+        elif ch in SMART_QUOTES:
+            quote = smart = SMART_QUOTES[ch]
+            out.append(quote)
+        elif ch == '#':
+            while i < n and text[i] != '\n':
+                i += 1
+            continue
+        elif ch in '{[':
+            stack.append(ch)
+            out.append(ch)
+        elif ch in '}]':
+            _stripTrailingComma(out)
+            if stack:
+                stack.pop()
+            out.append(ch)
+            safe_point = (len(out), list(stack))
+        elif ch.isalpha():
+            start = i
+            while i < n and (text[i].isalnum() or text[i] == '_'):
+                i += 1
+            word = text[start:i]
+            out.append(PYTHON_WORDS.get(word.lower(), word))
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    if quote is not None or stack:
+        if safe_point is None:
+            errors.append("Output was truncated before any complete value")
+            return ''.join(out), errors
+        errors.append("Output was truncated, kept everything up to the last complete value")
+        length, stack = safe_point
+        del out[length:]
+        _stripTrailingComma(out)
+        out.extend('}' if opener == '{' else ']' for opener in reversed(stack))
+
+    return ''.join(out), errors
+
+# Parse a dictionary from LLM output, returns (dict or None, errors)
+def parseDict(text):
+    dict_text = extractDictText(text)
+    if dict_text is None:
+        return None, ["No dictionary found in response"]
+
+    # Fast path, well-formed JSON
+    try:
+        value = json.loads(dict_text, strict=False)
+        if isinstance(value, dict):
+            return value, []
+    except ValueError:
+        pass
+
+    repaired, errors = repairDictText(dict_text)
+    try:
+        value = ast.literal_eval(repaired)
+    except (ValueError, SyntaxError, MemoryError, RecursionError) as e:
+        return None, errors + [f"Could not parse response: {str(e)}"]
+    if not isinstance(value, dict):
+        return None, errors + ["Response is not a dictionary"]
+    return value, errors
+
+# Parse a single question object, returns the dict or None
+def parseObject(text):
+    value, _ = parseDict(text)
+    return value
+
+# Parse a generated quiz, returns (quiz or None, errors). Questions missing required fields
+# are dropped and reported, the rest of the quiz is kept.
+def parseQuiz(text):
+    quiz, errors = parseDict(text)
+    if quiz is None:
+        return None, errors
+
+    questions = quiz.get('questions')
+    if not isinstance(questions, list):
+        return quiz, errors + ["Quiz has no questions list"]
+
+    kept = []
+    for index, question in enumerate(questions):
+        if not isinstance(question, dict):
+            errors.append(f"Question {index + 1} is not an object")
+            continue
+        missing = [field for field in REQUIRED_QUESTION_FIELDS if field not in question]
+        if missing:
+            errors.append(f"Question {index + 1} is missing {', '.join(missing)}")
+            continue
+        kept.append(question)
+    quiz['questions'] = kept
+    return quiz, errors
@@ -0,0 +1,86 @@
+import re
+import json
+from quizparser import parseObject, REQUIRED_QUESTION_FIELDS
+
+# Finds the opening bracket of the questions array in JSON or Python dict output
+QUESTIONS_ARRAY = re.compile(r'["\']questions["\']\s*:\s*\[')
+
+# Identifies a question across the incremental parse and the final parse of the same text.
+# Positions can't be used: the final parse drops malformed questions, shifting every later index.
+def questionStreamKey(question):
+    return ' '.join(str(question.get('question') or '').lower().split())
+
+# Picks complete question objects out of a quiz while the model is still writing it.
+# feed() takes each text fragment and returns the questions completed by it.
+class QuestionStreamParser:
+    def __init__(self):
+        self.text = ''
+        self.pos = 0 # next character to scan
+        self.in_array = False
+        self.finished = False
+        self.depth = 0
+        self.quote = None # quote character of the string being scanned
+        self.escape = False
+        self.object_start = None
+        self.count = 0 # question objects seen so far
+        self.emitted = set() # questionStreamKey of every question returned
+
+    def feed(self, chunk):
+        self.text += chunk
+        if self.finished:
+            return []
+
+        if not self.in_array:
+            match = QUESTIONS_ARRAY.search(self.text)
+            if not match:
+                return []
+            self.in_array = True
+            self.pos = match.end()
+
+        questions = []
+        text = self.text
+        i = self.pos
+        while i < len(text):
+            ch = text[i]
+            if self.quote:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == self.quote:
+                    self.quote = None
+            elif ch in '"\'':
+                self.quote = ch
+            elif ch == '{':
+                if self.depth == 0:
+                    self.object_start = i
+                self.depth += 1
+            elif ch == '}':
+                self.depth -= 1
+                if self.depth == 0 and self.object_start is not None:
+                    question = parseObject(text[self.object_start:i + 1])
+                    if question is not None and all(field in question for field in REQUIRED_QUESTION_FIELDS):
+                        questions.append(question)
+                        self.emitted.add(questionStreamKey(question))
+                    self.count += 1
+                    self.object_start = None
+            elif ch == ']' and self.depth == 0:
+                self.finished = True
+                i += 1
+                break
+            i += 1
+        self.pos = i
+        return questions
+
+    # Questions of the final parse that feed() never returned, in order
+    def remaining(self, questions):
+        return [question for question in questions if questionStreamKey(question) not in self.emitted]
+
+# Format stream events as Server-Sent Events or newline-delimited JSON
+def formatStreamEvents(events, use_sse=False):
+    for event in events:
+        payload = json.dumps(event, default=str)
+        if use_sse:
+            yield f"event: {event.get('type', 'message')}\ndata: {payload}\n\n"
+        else:
+            yield payload + '\n'
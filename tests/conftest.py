@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Modules import config through db, which needs these set. Nothing here connects to MongoDB,
+# db opens its connection on first use.
+os.environ.setdefault('MONGODB_URI', 'mongodb://localhost:27017/quizdb')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,39 @@
+import time
+from cache import LRUCache, cacheKey, normalizeText
+
+def test_cache_key_is_stable_and_order_independent_for_dicts():
+    assert cacheKey('gpt', {'a': 1, 'b': 2}) == cacheKey('gpt', {'b': 2, 'a': 1})
+    assert cacheKey('gpt', 'notes') != cacheKey('claude', 'notes')
+    assert len(cacheKey('x')) == 64
+
+def test_normalize_text():
+    assert normalizeText("  some\n\tnotes   here ") == "some notes here"
+    assert normalizeText(None) == ""
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1 # a is now the most recent
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+
+def test_ttl_expiry():
+    cache = LRUCache(maxsize=4, ttl=0.05)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=10)
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+
+def test_delete_clear_and_stats():
+    cache = LRUCache(maxsize=4)
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('missing')
+    cache.delete('a')
+    assert cache.get('a') is None
+    cache.set('b', 2)
+    cache.clear()
+    assert cache.stats() == {'size': 0, 'maxsize': 4, 'hits': 1, 'misses': 2}
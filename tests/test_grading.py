@@ -0,0 +1,48 @@
+from grading import answerSet, compileAnswerKey, gradeSubmission
+
+QUESTIONS = [
+    {'id': '1', 'correctAnswer': 'Paris'},
+    {'id': '2', 'correctAnswer': ['2', '4'], 'isMultiAnswer': True},
+    {'id': '3', 'correctAnswer': 'Blue'},
+]
+KEY = compileAnswerKey(QUESTIONS)
+
+def test_answer_set():
+    assert answerSet(None) == frozenset()
+    assert answerSet(' Paris ') == frozenset(['Paris'])
+    assert answerSet(['2', None, 4]) == frozenset(['2', '4'])
+
+def test_all_correct():
+    graded = gradeSubmission(KEY, {'answers': {'1': 'Paris', '2': ['4', '2'], '3': 'Blue'}})
+    assert (graded['correct'], graded['total'], graded['score']) == (3, 3, 100)
+
+def test_leaving_out_questions_counts_them_wrong():
+    graded = gradeSubmission(KEY, {'answers': {'1': 'Paris'}})
+    assert (graded['correct'], graded['total']) == (1, 3)
+    assert [result['answered'] for result in graded['questions']] == [True, False, False]
+
+def test_question_ids_in_the_submission_are_ignored():
+    graded = gradeSubmission(KEY, {'answers': {'1': 'Paris'}, 'questionIds': ['1']})
+    assert graded['total'] == 3
+
+def test_grades_the_server_side_question_set():
+    graded = gradeSubmission(KEY, {'answers': {'1': 'Paris', '3': 'Red'}}, questionIds=['3', '1'])
+    assert [result['questionId'] for result in graded['questions']] == ['3', '1']
+    assert graded['score'] == 50
+
+def test_multi_answer_needs_the_whole_set():
+    graded = gradeSubmission(KEY, {'answers': {'2': ['2']}}, questionIds=['2'])
+    assert graded['correct'] == 0
+
+def test_single_answer_takes_one_option():
+    graded = gradeSubmission(KEY, {'answers': {'1': ['Paris', 'Rome']}}, questionIds=['1'])
+    assert graded['correct'] == 0
+
+def test_unknown_question_and_echoed_fields():
+    graded = gradeSubmission(KEY, {'answers': {}, 'attemptId': 'a1', 'userId': 'u1'}, questionIds=['9'])
+    assert graded['questions'] == [{'questionId': '9', 'correct': False, 'error': 'Unknown question'}]
+    assert (graded['attemptId'], graded['userId']) == ('a1', 'u1')
+
+def test_results_do_not_reveal_the_answers():
+    graded = gradeSubmission(KEY, {'answers': {}})
+    assert all('correctAnswers' not in result for result in graded['questions'])
@@ -0,0 +1,21 @@
+import io
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+from images import openImage, encodeVariant
+
+def test_phone_mpo_is_opened_as_jpeg():
+    content = io.BytesIO()
+    Image.new('RGB', (2000, 1000), 'red').save(content, 'MPO', save_all=True, append_images=[Image.new('RGB', (200, 100))])
+    image, image_format = openImage(content.getvalue())
+    assert image_format == 'JPEG'
+    assert image.size == (2000, 1000)
+    data, width, height = encodeVariant(image, 480, image_format)
+    assert Image.open(io.BytesIO(data)).format == 'JPEG'
+    assert (width, height) == (480, 240)
+
+def test_animated_gif_is_not_resized():
+    content = io.BytesIO()
+    frames = [Image.new('RGB', (50, 50), color) for color in ('red', 'blue')]
+    frames[0].save(content, 'GIF', save_all=True, append_images=frames[1:])
+    assert openImage(content.getvalue()) == (None, 'GIF')
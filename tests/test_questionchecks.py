@@ -0,0 +1,56 @@
+from questionchecks import comparisonKey, localFeedback, matchOption, questionIssues, quizIssues, repairQuestion
+
+def question(**fields):
+    value = {'id': '1', 'question': 'Which language is this?', 'options': ['C', 'C++', 'C#', 'Java'],
+             'correctAnswer': 'C#', 'explanation': 'It uses properties.'}
+    value.update(fields)
+    return value
+
+def test_symbol_options_are_not_duplicates():
+    assert questionIssues(question()) == []
+    assert questionIssues(question(options=['1', '-1', '0', '2'], correctAnswer='-1')) == []
+    assert questionIssues(question(options=['x + 1', 'x - 1', 'x * 1', 'x / 1'], correctAnswer='x * 1')) == []
+
+def test_trivially_different_options_are_duplicates():
+    issues = questionIssues(question(options=['The mitochondria', 'mitochondria', 'Nucleus', 'Ribosome'], correctAnswer='Nucleus'))
+    assert issues == ["Option 2 duplicates option 1"]
+    assert questionIssues(question(options=['Paris', ' paris ', 'Rome', 'Oslo'], correctAnswer='Rome')) == ["Option 2 duplicates option 1"]
+
+def test_numbers_stay_distinct():
+    assert comparisonKey('increases by 10%') != comparisonKey('increases by 20%')
+    assert comparisonKey('2 + 2') != comparisonKey('2 - 2')
+
+def test_match_option_prefers_the_exact_symbol():
+    options = ['C', 'C++', 'C#', 'Java']
+    assert matchOption('c#', options) == 'C#'
+    assert matchOption('c++', options) == 'C++'
+    assert matchOption('c', options) == 'C'
+    assert matchOption('-1', ['1', '-1', '0', '2']) == '-1'
+
+def test_match_option_loosely_and_by_letter():
+    options = ['Paris', 'Rome', 'Oslo', 'Bern']
+    assert matchOption('paris.', options) == 'Paris'
+    assert matchOption('B', options) == 'Rome'
+    assert matchOption('Option D', options) == 'Bern'
+    assert matchOption('c) Oslo', options) == 'Oslo'
+    assert matchOption('Madrid', options) is None
+
+def test_repair_question():
+    repaired = repairQuestion(question(options=[' C', 'C++ ', 'C#', 'Java'], correctAnswer='c)'))
+    assert repaired['options'] == ['C', 'C++', 'C#', 'Java']
+    assert repaired['correctAnswer'] == 'C#'
+    multi = repairQuestion(question(correctAnswer=['a', 'java'], isMultiAnswer=True))
+    assert multi['correctAnswer'] == ['C', 'Java']
+
+def test_question_issues():
+    assert questionIssues({'question': ' ', 'options': 'abc'}) == ["Question text is empty", "Options are not a list"]
+    issues = questionIssues(question(options=['C', 'C++', ''], correctAnswer='Go', explanation=''))
+    assert issues == ["Has 3 options instead of 4", "Has an empty option", "correctAnswer is not one of the options", "Explanation is empty"]
+
+def test_quiz_issues_flags_repeated_questions():
+    questions = [question(), question(id='2', question='which language is this'), question(id='3', question='Which language is that?')]
+    assert quizIssues(questions) == {1: ["Repeats question 1"]}
+
+def test_local_feedback_shape():
+    feedback = localFeedback(["Explanation is empty"])
+    assert feedback['score'] == 0 and feedback['structural'] and feedback['issues'] == ["Explanation is empty"]
@@ -0,0 +1,58 @@
+from questionindex import (BANDS, NUM_PERMUTATIONS, _entryWrites, bandKeys, filterDuplicates, normalizeQuestionText,
+                           scopesFor, shingles, signature, similarity)
+
+QUESTION = "Which organelle produces most of the energy in a eukaryotic cell?"
+
+def test_normalize_question_text():
+    assert normalizeQuestionText("  What's  the CAPITAL of France?? ") == "what s the capital of france"
+    assert normalizeQuestionText(None) == ""
+
+def test_shingles():
+    assert shingles("abcdef") == {'abcd', 'bcde', 'cdef'}
+    assert shingles("ab") == {'ab'}
+    assert shingles("?!") == set()
+
+def test_signature_is_deterministic_and_sized():
+    sig = signature(QUESTION)
+    assert len(sig) == NUM_PERMUTATIONS
+    assert sig == signature(QUESTION.upper())
+    assert signature("") is None
+
+def test_similarity_separates_rephrasings_from_different_questions():
+    same = similarity(signature(QUESTION), signature(QUESTION.replace("most of", "most")))
+    different = similarity(signature(QUESTION), signature("What is the chemical symbol of gold?"))
+    assert same >= 0.8
+    assert different < 0.3
+    assert similarity(signature(QUESTION), signature(QUESTION)) == 1
+
+def test_band_keys():
+    keys = bandKeys(signature(QUESTION))
+    assert len(keys) == BANDS
+    assert [key.split(':')[0] for key in keys] == [str(band) for band in range(BANDS)]
+    assert keys == bandKeys(signature(QUESTION))
+    assert set(keys).isdisjoint(bandKeys(signature("What is the chemical symbol of gold?")))
+
+def test_scopes_for():
+    assert scopesFor('u1', 'Science') == ['user:u1', 'category:Science']
+    assert scopesFor(None, None) == []
+
+def test_filter_duplicates_within_the_list():
+    questions = [{'id': '1', 'question': QUESTION}, {'id': '2', 'question': QUESTION + '!'},
+                 {'id': '3', 'question': "What is the chemical symbol of gold?"}]
+    kept, dropped = filterDuplicates(questions, scopes=[])
+    assert [question['id'] for question in kept] == ['1', '3']
+    assert dropped == [{'question': questions[1], 'duplicateOf': {'questionId': '1', 'text': QUESTION}}]
+
+def test_filter_duplicates_against_accepted_questions():
+    accepted = [{'id': '1', 'question': QUESTION}]
+    kept, dropped = filterDuplicates([{'id': '2', 'question': QUESTION}, {'id': '3', 'question': "How many legs does an insect have?"}],
+                                     scopes=[], accepted=accepted)
+    assert [question['id'] for question in kept] == ['3']
+    assert dropped[0]['duplicateOf']['questionId'] == '1'
+
+def test_entries_are_keyed_by_question_id_and_occurrence():
+    quiz = {'_id': 'q1', 'userId': 'u1', 'category': None,
+            'questions': [{'id': '1', 'question': QUESTION}, {'id': '1', 'question': "What is the chemical symbol of gold?"},
+                          {'id': '2', 'question': '?'}]}
+    writes = _entryWrites(quiz, 'run1')
+    assert [write._doc['_id'] for write in writes] == ['user:u1|q1|1|0', 'user:u1|q1|1|1']
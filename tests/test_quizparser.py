@@ -0,0 +1,52 @@
+from quizparser import parseDict, parseQuiz, repairDictText
+
+QUESTION = "{'id': '1', 'question': 'What is 2 + 2?', 'options': ['3', '4', '5', '6'], 'correctAnswer': '4'}"
+
+def test_parses_plain_json():
+    value, errors = parseDict('{"title": "Maths", "questions": []}')
+    assert value == {'title': 'Maths', 'questions': []}
+    assert errors == []
+
+def test_parses_python_dict_in_code_fence():
+    value, errors = parseDict("```python\n{'title': 'Maths', 'done': True, 'extra': None}\n```")
+    assert value == {'title': 'Maths', 'done': True, 'extra': None}
+
+def test_repairs_trailing_commas_comments_and_json_literals():
+    value, _ = parseDict("{'title': 'Maths', # a comment\n 'flag': true, 'items': [1, 2,],}")
+    assert value == {'title': 'Maths', 'flag': True, 'items': [1, 2]}
+
+def test_repairs_smart_quotes_but_keeps_apostrophes():
+    value, _ = parseDict("{“title”: “Newton’s laws”}")
+    assert value == {'title': "Newton’s laws"}
+
+def test_keeps_curly_quotes_inside_strings():
+    value, _ = parseDict('{"title":"T","questions":[{"question":"He said “hi”","options":["a"],"correctAnswer":"a",}]}')
+    assert value['questions'][0]['question'] == 'He said “hi”'
+    value, _ = parseDict("{'question': 'He said “hi”', 'done': True, 'extra': None}")
+    assert value == {'question': 'He said “hi”', 'done': True, 'extra': None}
+    value, _ = parseDict("{“title”: “The “best” one”, “count”: 1}")
+    assert value == {'title': 'The “best” one', 'count': 1}
+
+def test_truncated_output_keeps_complete_questions():
+    text = "{'title': 'Maths', 'questions': [" + QUESTION + ", {'id': '2', 'question': 'What is"
+    quiz, errors = parseQuiz(text)
+    assert [question['id'] for question in quiz['questions']] == ['1']
+    assert any('truncated' in error for error in errors)
+
+def test_never_evaluates_code():
+    value, errors = parseDict("{'title': __import__('os').getcwd()}")
+    assert value is None
+    assert errors
+
+def test_raw_newlines_in_strings_are_escaped():
+    repaired, _ = repairDictText("{'text': 'line one\nline two'}")
+    assert repaired == "{'text': 'line one\\nline two'}"
+
+def test_parse_quiz_drops_questions_missing_fields():
+    text = "{'questions': [" + QUESTION + ", {'id': '2', 'question': 'No options'}, 'not a question']}"
+    quiz, errors = parseQuiz(text)
+    assert [question['id'] for question in quiz['questions']] == ['1']
+    assert errors == ["Question 2 is missing options, correctAnswer", "Question 3 is not an object"]
+
+def test_no_dictionary():
+    assert parseQuiz("Sorry, I can't help with that") == (None, ["No dictionary found in response"])
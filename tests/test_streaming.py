@@ -0,0 +1,60 @@
+import json
+from quizparser import parseQuiz
+from streaming import QuestionStreamParser, formatStreamEvents
+
+def question(number, **fields):
+    value = {'id': str(number), 'question': f"Question {number}?", 'options': ['a', 'b', 'c', 'd'], 'correctAnswer': 'a'}
+    value.update(fields)
+    return value
+
+def stream(parser, text, size=7):
+    questions = []
+    for start in range(0, len(text), size):
+        questions.extend(parser.feed(text[start:start + size]))
+    return questions
+
+def test_fallback_does_not_resend_after_a_dropped_question():
+    broken = question(2)
+    del broken['correctAnswer']
+    quiz = {'title': 'Quiz', 'questions': [question(1), broken, question(3), question(4)]}
+    text = repr(quiz)
+
+    parser = QuestionStreamParser()
+    sent = stream(parser, text)
+    final, _ = parseQuiz(parser.text)
+    sent += parser.remaining(final['questions'])
+
+    assert [item['id'] for item in sent] == ['1', '3', '4']
+
+def test_questions_are_returned_as_soon_as_they_close():
+    parser = QuestionStreamParser()
+    assert parser.feed("{'title': 'Quiz', 'questions': [") == []
+    assert parser.feed(repr(question(1))[:-1]) == []
+    assert parser.feed("}, ") == [question(1)]
+    assert parser.feed(repr(question(2)) + "]}") == [question(2)]
+    assert parser.finished
+
+def test_braces_and_quotes_inside_strings_do_not_split_objects():
+    tricky = question(1, question="Which of {a, b} is \"right\" in dict['key']?", explanation="It's } not {")
+    parser = QuestionStreamParser()
+    assert stream(parser, '{"questions": [' + json.dumps(tricky) + ']}', size=3) == [tricky]
+
+def test_nested_objects_belong_to_their_question():
+    nested = question(1, imageMetadata={'size': {'width': 10}})
+    parser = QuestionStreamParser()
+    assert stream(parser, repr({'questions': [nested]})) == [nested]
+
+def test_nothing_before_the_questions_array():
+    parser = QuestionStreamParser()
+    assert parser.feed("{'title': 'A {curly} title', 'meta': {'x': 1}, ") == []
+    assert parser.feed("'questions': [" + repr(question(1)) + "]}") == [question(1)]
+
+def test_text_after_the_array_is_ignored():
+    parser = QuestionStreamParser()
+    stream(parser, repr({'questions': [question(1)]}))
+    assert parser.feed("{'id': '9', 'question': 'late', 'options': [], 'correctAnswer': 'x'}") == []
+
+def test_format_stream_events():
+    events = [{'type': 'question', 'question': {'id': '1'}}, {'type': 'done'}]
+    assert list(formatStreamEvents(events)) == ['{"type": "question", "question": {"id": "1"}}\n', '{"type": "done"}\n']
+    assert list(formatStreamEvents(events[1:], use_sse=True)) == ['event: done\ndata: {"type": "done"}\n\n']